@@ -0,0 +1,10 @@
+# Environment configuration, resolved once at import
+import os
+
+# Only parse .env for local development; deployed containers get real env vars
+if not os.getenv("OPENAI_API_KEY"):
+    from dotenv import load_dotenv
+    load_dotenv()
+
+# Fail fast at import on misconfiguration instead of branching on every call
+OPENAI_API_KEY: str = os.environ["OPENAI_API_KEY"]
@@ -1,52 +1,88 @@
 import asyncio
+import time
 import openai
 import httpx
-import os
-from dotenv import load_dotenv
-import jose.jwt
+from config import OPENAI_API_KEY as API_KEY
+
+# Shared httpx connection pool used by every OpenAI client in this script.
+# trust_env=False skips proxy lookup from the environment (replaces proxies={}).
+_http_client = httpx.AsyncClient(
+    limits=httpx.Limits(max_keepalive_connections=20, max_connections=100, keepalive_expiry=30.0),
+    timeout=httpx.Timeout(30.0, connect=5.0),
+    trust_env=False
+)
+
+# Shared OpenAI client, created on first use and reused until shutdown
+_client: openai.AsyncOpenAI | None = None
+_client_lock = asyncio.Lock()
+
+async def get_client() -> openai.AsyncOpenAI:
+    """Return the process-wide OpenAI client, creating it on first call."""
+    global _client
+    if _client is None:
+        async with _client_lock:
+            if _client is None:
+                _client = openai.AsyncOpenAI(api_key=API_KEY, http_client=_http_client)
+    return _client
+
+async def shutdown():
+    """Close the shared OpenAI client and its connection pool (call once on process exit)."""
+    global _client
+    _client = None
+    await _http_client.aclose()
+
+async def probe_default():
+    """Attempt 1: initialize the shared singleton client."""
+    try:
+        # Singleton client backed by the shared httpx pool
+        start_time = time.time()
+        await get_client()
+        return ("Default client", True, f"initialized in {time.time() - start_time:.3f}s")
+    except Exception as e:
+        return ("Default client", False, str(e))
+
+async def probe_custom():
+    """Attempt 2: initialize a second client on the shared httpx pool."""
+    try:
+        # Reuses the shared pool, so no second TLS handshake; closed once in shutdown()
+        openai.AsyncOpenAI(
+            api_key=API_KEY,
+            http_client=_http_client
+        )
+        return ("Custom client", True, "initialized on the shared connection pool")
+    except Exception as e:
+        return ("Custom client", False, str(e))
 
 async def main():
     """
     A minimal script to isolate the OpenAI client initialization.
     """
     print("--- Starting OpenAI Client Debug ---")
-    
-    # Load environment variables (for OPENAI_API_KEY)
-    load_dotenv()
-    api_key = os.getenv("OPENAI_API_KEY")
-    
-    if not api_key:
-        print("ERROR: OPENAI_API_KEY not found in environment.")
-        return
 
     print(f"OpenAI library version: {openai.__version__}")
     print(f"HTTPX library version: {httpx.__version__}")
 
-    try:
-        print("\nAttempt 1: Initializing OpenAI client WITHOUT custom httpx client...")
-        # This is the version that fails in the app
-        client_default = openai.AsyncOpenAI(api_key=api_key)
-        await client_default.close()
-        print("✅ SUCCESS: Default client initialized and closed without error.")
-    except Exception as e:
-        print(f"❌ FAILED: Could not initialize default client. Error: {e}")
+    print("\nRunning both initialization attempts concurrently...")
+    results = await asyncio.gather(probe_default(), probe_custom(), return_exceptions=True)
 
-    print("-" * 20)
-
-    try:
-        print("\nAttempt 2: Initializing OpenAI client WITH custom httpx client (proxies disabled)...")
-        # This is the fix we've been trying
-        custom_httpx_client = httpx.AsyncClient(proxies={})
-        client_custom = openai.AsyncOpenAI(
-            api_key=api_key,
-            http_client=custom_httpx_client
-        )
-        await client_custom.close()
-        print("✅ SUCCESS: Custom client initialized and closed without error.")
-    except Exception as e:
-        print(f"❌ FAILED: Could not initialize custom client. Error: {e}")
+    for result in results:
+        print("-" * 20)
+        if isinstance(result, BaseException):
+            print(f"❌ FAILED: Unexpected probe error: {result}")
+            continue
+        label, ok, detail = result
+        if ok:
+            print(f"✅ SUCCESS: {label} {detail}.")
+        else:
+            print(f"❌ FAILED: Could not initialize {label.lower()}. Error: {detail}")
 
     print("\n--- Debug Finished ---")
 
+async def run():
+    try:
+        await main()
+    finally:
+        await shutdown()
+
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    asyncio.run(run())
@@ -1,24 +1,29 @@
 # Chat-PRD Streaming API - Version 1.0.1
 import os
 import json
+import gzip
 import asyncio
+import hashlib
 import time
-import tempfile
+import io
 import logging
 import re
-import requests
-import datetime
-from typing import AsyncGenerator, List, Dict, Any
+from typing import AsyncGenerator, List, Dict
 from datetime import datetime
+from contextlib import asynccontextmanager
+from functools import lru_cache
 
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 import openai
+import httpx
+import orjson
+import tiktoken
 from google.cloud import firestore, secretmanager, storage
-from docx import Document
-from collections import defaultdict
+from google.api_core.exceptions import NotFound, PreconditionFailed
+from collections import OrderedDict, defaultdict, deque
 from dotenv import load_dotenv
 
 # Load environment variables from .env file for local development
@@ -27,12 +32,40 @@ load_dotenv()
 # Project constants  
 PROJECT_ID = os.environ.get('GOOGLE_CLOUD_PROJECT', 'explo-website-tools')
 SERVICE_ACCOUNT_EMAIL = '142797649545-compute@developer.gserviceaccount.com'
+DOCX_MIME_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Chat-PRD Streaming API", version="1.0.0")
+# Markdown table separator row, e.g. |-----|-----|
+_TABLE_DIVIDER = re.compile(r'^\|?\s*-+\s*\|')
+# Markdown line prefixes handled by the docx export
+_HEADING_LEVELS = {'#': 1, '##': 2, '###': 3}
+_BULLET_MARKERS = frozenset({'-', '*'})
+
+# Process lifecycle: one shared OpenAI connection pool plus the rate limiter sweep
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.openai_client = None
+    try:
+        app.state.openai_client = await create_openai_client()
+        logger.info("Shared OpenAI client initialized")
+    except Exception as e:
+        # Don't block startup; get_openai_client() retries on first request
+        logger.warning(f"OpenAI client not initialized at startup: {e}")
+    sweep_task = asyncio.create_task(sweep_rate_limiter())
+    yield
+    sweep_task.cancel()
+    if app.state.openai_client is not None:
+        await app.state.openai_client.close()
+
+app = FastAPI(
+    title="Chat-PRD Streaming API",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
+)
 
 # CORS configuration
 app.add_middleware(
@@ -63,24 +96,46 @@ class RateLimiter:
     def __init__(self, max_requests: int = 100, window_seconds: int = 60):
         self.max_requests = max_requests
         self.window_seconds = window_seconds
-        self.requests = defaultdict(list)
+        self.requests = defaultdict(deque)
     
     def is_allowed(self, client_ip: str) -> bool:
         now = time.time()
         client_requests = self.requests[client_ip]
         
-        # Remove old requests
-        client_requests[:] = [req_time for req_time in client_requests 
-                             if now - req_time < self.window_seconds]
+        # Remove old requests (timestamps are appended in order)
+        while client_requests and now - client_requests[0] >= self.window_seconds:
+            client_requests.popleft()
         
         if len(client_requests) >= self.max_requests:
             return False
         
         client_requests.append(now)
         return True
+    
+    def sweep(self) -> int:
+        """Drop clients with no requests inside the window; returns how many were evicted"""
+        cutoff = time.time() - self.window_seconds
+        idle = [ip for ip, times in self.requests.items() if not times or times[-1] <= cutoff]
+        for ip in idle:
+            del self.requests[ip]
+        return len(idle)
+
+async def sweep_rate_limiter():
+    """Evict idle client IPs once per window so the limiter's dict doesn't grow unbounded"""
+    while True:
+        await asyncio.sleep(rate_limiter.window_seconds)
+        evicted = rate_limiter.sweep()
+        if evicted:
+            logger.info(f"Rate limiter evicted {evicted} idle clients")
 
 rate_limiter = RateLimiter()
 
+# Roles forwarded to OpenAI
+_VALID_ROLES = frozenset({'system', 'user', 'assistant'})
+
+# Prompt budget for chat context (system prompt + recent turns)
+MAX_PROMPT_TOKENS = 6000
+
 # Pydantic models
 class ChatMessage(BaseModel):
     role: str
@@ -102,31 +157,97 @@ class OptimizeRequest(BaseModel):
     totalTokens: int = 0
 
 # Utility functions
+_OPENAI_KEY = None
+_openai_key_lock = asyncio.Lock()
+
 async def get_openai_key():
-    """Retrieve OpenAI API key from Secret Manager or environment"""
-    try:
-        # First try environment variable (for local development)
-        api_key = os.environ.get('OPENAI_API_KEY')
-        if api_key:
-            logger.info("Using OpenAI API key from environment variable")
-            return api_key
-        
-        # Try Secret Manager
-        if secret_client:
-            name = f"projects/{PROJECT_ID}/secrets/openai-api-key/versions/latest"
-            response = secret_client.access_secret_version(request={"name": name})
-            api_key = response.payload.data.decode("UTF-8")
-            logger.info("Using OpenAI API key from Secret Manager")
-            return api_key
-        
-        raise Exception("No OpenAI API key found in environment or Secret Manager")
-    except Exception as e:
-        logger.error(f"Failed to get OpenAI API key: {e}")
-        raise HTTPException(status_code=500, detail=f"API key configuration error: {str(e)}")
+    """Retrieve OpenAI API key from Secret Manager or environment (resolved once per process)"""
+    global _OPENAI_KEY
+    if _OPENAI_KEY:
+        return _OPENAI_KEY
+    # Only one coroutine performs the lookup; the rest wait and reuse its result
+    async with _openai_key_lock:
+        if _OPENAI_KEY:
+            return _OPENAI_KEY
+        try:
+            # First try environment variable (for local development)
+            api_key = os.environ.get('OPENAI_API_KEY')
+            if api_key:
+                logger.info("Using OpenAI API key from environment variable")
+                _OPENAI_KEY = api_key
+                return api_key
+            
+            # Try Secret Manager
+            if secret_client:
+                name = f"projects/{PROJECT_ID}/secrets/openai-api-key/versions/latest"
+                response = await asyncio.to_thread(secret_client.access_secret_version, request={"name": name})
+                api_key = response.payload.data.decode("UTF-8")
+                logger.info("Using OpenAI API key from Secret Manager")
+                _OPENAI_KEY = api_key
+                return api_key
+            
+            raise Exception("No OpenAI API key found in environment or Secret Manager")
+        except Exception as e:
+            logger.error(f"Failed to get OpenAI API key: {e}")
+            raise HTTPException(status_code=500, detail=f"API key configuration error: {str(e)}")
+
+@lru_cache(maxsize=1)
+def _token_encoding():
+    """o200k_base BPE used by gpt-4o-mini (loaded on first use; baked into the image at build time)"""
+    return tiktoken.get_encoding("o200k_base")
 
+@lru_cache(maxsize=4096)
 def estimate_tokens(text: str) -> int:
-    """Rough token estimation"""
-    return max(1, len(text) // 4)
+    """Token count using the model's BPE; cached so unchanged messages aren't re-encoded across turns"""
+    return len(_token_encoding().encode(text, disallowed_special=()))
+
+def build_prompt_messages(conversation: List[ChatMessage]) -> List[Dict[str, str]]:
+    """Most recent messages that fit in MAX_PROMPT_TOKENS, oldest first.
+
+    A leading system prompt is always kept so the start of the prompt stays
+    byte-identical across turns and OpenAI's automatic prompt caching applies.
+    """
+    valid = [msg for msg in conversation if msg.role in _VALID_ROLES]
+    if not valid:
+        return []
+    head = [{'role': valid[0].role, 'content': valid[0].content}] if valid[0].role == 'system' else []
+    budget = MAX_PROMPT_TOKENS - sum(estimate_tokens(msg['content']) for msg in head)
+    
+    # Walk newest to oldest; the newest message is always included
+    tail = []
+    for msg in reversed(valid[len(head):]):
+        cost = estimate_tokens(msg.content)
+        if tail and cost > budget:
+            break
+        tail.append({'role': msg.role, 'content': msg.content})
+        budget -= cost
+    tail.reverse()
+    return head + tail
+
+def _iter_md_runs(text):
+    """Yield (kind, substring) runs for **bold** / *italic* markdown; kind is plain, bold or italic."""
+    plain_start = 0
+    i = text.find('*')
+    while i != -1:
+        kind = None
+        if text.startswith('**', i):
+            end = text.find('*', i + 2)
+            if end > i + 2 and text.startswith('*', end + 1):
+                kind, start, stop = 'bold', i + 2, end + 2
+        else:
+            end = text.find('*', i + 1)
+            if end > i + 1:
+                kind, start, stop = 'italic', i + 1, end + 1
+        if kind is None:
+            i = text.find('*', i + 1)
+            continue
+        if i > plain_start:
+            yield 'plain', text[plain_start:i]
+        yield kind, text[start:end]
+        plain_start = stop
+        i = text.find('*', stop)
+    if plain_start < len(text):
+        yield 'plain', text[plain_start:]
 
 # Rate limiting middleware
 @app.middleware("http")
@@ -146,13 +267,15 @@ async def rate_limit_middleware(request: Request, call_next):
 # Client creation with explicit httpx configuration to avoid proxies parameter
 async def create_openai_client():
     """Creates an OpenAI client with explicit httpx configuration."""
-    import httpx
     api_key = await get_openai_key()
     
-    # Create httpx client explicitly without proxies parameter
+    # Create httpx client explicitly without proxies parameter; HTTP/2 lets
+    # concurrent streams multiplex over one TLS connection to api.openai.com.
+    # The pool is sized for the HTTP/1.1 fallback, where each open SSE stream pins a connection.
     http_client = httpx.AsyncClient(
-        timeout=30.0,
-        limits=httpx.Limits(max_keepalive_connections=5, max_connections=10)
+        http2=True,
+        timeout=httpx.Timeout(60.0, connect=5.0),
+        limits=httpx.Limits(max_keepalive_connections=100, max_connections=200, keepalive_expiry=300.0)
     )
     
     return openai.AsyncOpenAI(
@@ -160,178 +283,272 @@ async def create_openai_client():
         http_client=http_client
     )
 
+_openai_client_lock = asyncio.Lock()
+
+async def get_openai_client():
+    """Return the shared OpenAI client, creating it if startup initialization failed."""
+    if app.state.openai_client is None:
+        # Serialize lazy creation so concurrent first requests don't each build a client
+        async with _openai_client_lock:
+            if app.state.openai_client is None:
+                app.state.openai_client = await create_openai_client()
+    return app.state.openai_client
+
+# Pre-encoded SSE framing
+_SSE_PREFIX = b"data: "
+_SSE_SUFFIX = b"\n\n"
+_SSE_DONE = b"data: [DONE]\n\n"
+
+def sse(payload: dict) -> bytes:
+    """Encode one Server-Sent Events data frame"""
+    return _SSE_PREFIX + orjson.dumps(payload) + _SSE_SUFFIX
+
+# Deltas are merged into one chunk event until either threshold is hit (batch mode only)
+SSE_FLUSH_CHARS = 256
+SSE_FLUSH_SECONDS = 0.05
+
+# Upper bound on time spent waiting on OpenAI for one streamed completion, in seconds
+# (time the client spends reading at its own pace doesn't count)
+STREAM_TIMEOUT_S = 60
+
+# Completed responses keyed by prompt hash, replayed when a client resubmits the same conversation
+RESPONSE_CACHE_SIZE = 512
+RESPONSE_CACHE_TTL = 600
+REPLAY_SLICE_CHARS = 50
+_response_cache: OrderedDict = OrderedDict()  # key -> (expires_at, full_response)
+
+def response_cache_key(messages: List[Dict[str, str]]) -> str:
+    """Hash the prompt messages sent to OpenAI"""
+    return hashlib.sha256(orjson.dumps(messages)).hexdigest()
+
+def get_cached_response(key: str) -> str | None:
+    """Return a cached full response if it hasn't expired"""
+    entry = _response_cache.get(key)
+    if entry is None:
+        return None
+    expires_at, text = entry
+    if time.monotonic() >= expires_at:
+        del _response_cache[key]
+        return None
+    _response_cache.move_to_end(key)
+    return text
+
+def cache_response(key: str, text: str):
+    """Store a full response, evicting the least recently used entries past RESPONSE_CACHE_SIZE"""
+    _response_cache[key] = (time.monotonic() + RESPONSE_CACHE_TTL, text)
+    _response_cache.move_to_end(key)
+    while len(_response_cache) > RESPONSE_CACHE_SIZE:
+        _response_cache.popitem(last=False)
+
+async def replay_cached_response(text: str) -> AsyncGenerator[bytes, None]:
+    """Replay a cached response as a stream so clients see the same event sequence"""
+    request_id = f"req_{int(time.time())}"
+    logger.info(f"Replaying cached response for {request_id}")
+    start_time = time.time()
+    chunk_count = 0
+    for i in range(0, len(text), REPLAY_SLICE_CHARS):
+        yield sse({'type': 'chunk', 'content': text[i:i + REPLAY_SLICE_CHARS]})
+        chunk_count += 1
+        await asyncio.sleep(0.01)
+    yield sse({
+        'type': 'complete',
+        'metadata': {
+            'duration': time.time() - start_time,
+            'chunk_count': chunk_count,
+            'length': len(text),
+            'request_id': request_id,
+            'cached': True
+        }
+    })
+    yield _SSE_DONE
+
 # Streaming function
-async def stream_openai_response(messages: List[Dict[str, str]]) -> AsyncGenerator[str, None]:
+async def stream_openai_response(messages: List[Dict[str, str]], batch: bool = True,
+                                 cache_key: str | None = None) -> AsyncGenerator[bytes, None]:
     """Stream OpenAI response chunks with comprehensive logging"""
     request_id = f"req_{int(time.time())}"
     logger.info(f"Starting stream {request_id}")
     
+    pending = []
+    pending_chars = 0
+    full_parts = []
     try:
-        client = await create_openai_client()
+        client = await get_openai_client()
         
         start_time = time.time()
         chunk_count = 0
         
-        # Create streaming completion
-        stream = await client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            stream=True,
-            max_tokens=2048,
-            temperature=0.7
-        )
+        total_chars = 0
+        last_flush = time.monotonic()
         
-        full_response = ""
+        # Cap the time spent waiting on upstream so a wedged stream can't hold a pool slot indefinitely.
+        # One timeout scope covers the upstream reads; its deadline is lifted while suspended at a yield
+        # (client backpressure doesn't count, and no cancel can land in Starlette's send) and re-armed
+        # with the remaining budget afterwards.
+        loop = asyncio.get_running_loop()
+        upstream_budget = STREAM_TIMEOUT_S
+        reading_since = loop.time()
+        async with asyncio.timeout(upstream_budget) as upstream_timeout:
+            # Create streaming completion; read the raw SSE lines and parse deltas
+            # with orjson instead of building pydantic chunk models per token
+            async with client.chat.completions.with_streaming_response.create(
+                model="gpt-4o-mini",
+                messages=messages,
+                stream=True,
+                max_tokens=2048,
+                temperature=0.7
+            ) as raw_stream:
+                async for line in raw_stream.iter_lines():
+                    if not line.startswith('data: '):
+                        continue
+                    data = line[6:]
+                    if data == '[DONE]':
+                        break
+                    choices = orjson.loads(data).get('choices')
+                    if not choices:
+                        continue
+                    content = choices[0].get('delta', {}).get('content')
+                    if content is not None:
+                        total_chars += len(content)
+                        chunk_count += 1
+                    
+                        # Queue the delta; one chunk event carries everything since the last flush
+                        # (request_id is only sent in the complete frame)
+                        pending.append(content)
+                        pending_chars += len(content)
+                        full_parts.append(content)
+                        if not batch or pending_chars >= SSE_FLUSH_CHARS or time.monotonic() - last_flush > SSE_FLUSH_SECONDS:
+                            upstream_budget -= loop.time() - reading_since
+                            upstream_timeout.reschedule(None)
+                            yield sse({'type': 'chunk', 'content': ''.join(pending)})
+                            reading_since = loop.time()
+                            upstream_timeout.reschedule(reading_since + upstream_budget)
+                            pending.clear()
+                            pending_chars = 0
+                            last_flush = time.monotonic()
         
-        async for chunk in stream:
-            if chunk.choices[0].delta.content is not None:
-                content = chunk.choices[0].delta.content
-                full_response += content
-                chunk_count += 1
-                
-                # Yield individual chunk
-                chunk_data = {'type': 'chunk', 'content': content, 'chunk_id': chunk_count, 'request_id': request_id}
-                yield f"data: {json.dumps(chunk_data)}\n\n"
+        if pending:
+            yield sse({'type': 'chunk', 'content': ''.join(pending)})
+            pending.clear()
+        
+        if cache_key and full_parts:
+            cache_response(cache_key, ''.join(full_parts))
         
         duration = time.time() - start_time
         logger.info(f"Stream {request_id} completed in {duration:.2f}s with {chunk_count} chunks")
         
-        # Final message with complete response
+        # Final message: clients assemble the text from chunk events, so only metadata is sent
         complete_data = {
             'type': 'complete', 
-            'content': full_response,
             'metadata': {
                 'duration': duration,
                 'chunk_count': chunk_count,
+                'length': total_chars,
                 'request_id': request_id
             }
         }
-        yield f"data: {json.dumps(complete_data)}\n\n"
+        yield sse(complete_data)
         
-        yield "data: [DONE]\n\n"
-        
-        # Close client properly with error handling
-        try:
-            await client.close()
-        except Exception as close_error:
-            logger.warning(f"Stream {request_id} client close error (non-critical): {close_error}")
+        yield _SSE_DONE
         
+    except TimeoutError:
+        logger.error(f"Stream {request_id} timed out after {STREAM_TIMEOUT_S}s")
+        if pending:
+            yield sse({'type': 'chunk', 'content': ''.join(pending)})
+        error_data = {'type': 'error', 'content': 'Streaming error: response timed out', 'request_id': request_id}
+        yield sse(error_data)
     except Exception as e:
         logger.error(f"Stream {request_id} failed: {str(e)}")
+        if pending:
+            yield sse({'type': 'chunk', 'content': ''.join(pending)})
         error_data = {'type': 'error', 'content': f'Streaming error: {str(e)}', 'request_id': request_id}
-        yield f"data: {json.dumps(error_data)}\n\n"
-        
-        # Ensure client cleanup even on error
-        try:
-            if 'client' in locals():
-                await client.close()
-        except Exception as close_error:
-            logger.warning(f"Stream {request_id} error cleanup client close (non-critical): {close_error}")
-
-# API endpoints
-@app.post("/chat/stream")
-async def chat_stream(request: ChatRequest):
-    """Streaming chat endpoint using Server-Sent Events"""
-    try:
-        # Prepare messages for OpenAI (last 20 messages for context)
-        messages = []
-        for msg in request.conversation[-20:]:
-            if msg.role in ['system', 'user', 'assistant']:
-                messages.append({
-                    'role': msg.role,
-                    'content': msg.content
-                })
-        
-        if not messages:
-            raise HTTPException(status_code=400, detail="No valid messages in conversation")
-        
-        return StreamingResponse(
-            stream_openai_response(messages),
-            media_type="text/event-stream",
-            headers={
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive",
-                "X-Accel-Buffering": "no",  # Disable Nginx buffering
-                "Access-Control-Allow-Origin": "*",
-                "Access-Control-Allow-Headers": "*",
-            }
-        )
-    except Exception as e:
-        logger.error(f"Streaming endpoint error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
-
-@app.post("/chat", response_model=ChatResponse)
-async def chat_fallback(request: ChatRequest):
-    """Fallback non-streaming endpoint for compatibility"""
-    try:
-        client = await create_openai_client()
-        
-        # Prepare messages
-        messages = []
-        for msg in request.conversation[-20:]:
-            if msg.role in ['system', 'user', 'assistant']:
-                messages.append({
-                    'role': msg.role,
-                    'content': msg.content
-                })
-        
-        if not messages:
-            raise HTTPException(status_code=400, detail="No valid messages in conversation")
-        
-        # Create completion
-        response = await client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            max_tokens=2048,
-            temperature=0.7
-        )
-        
-        result = ChatResponse(
-            response=response.choices[0].message.content,
-            tokenUsage={
-                "promptTokens": response.usage.prompt_tokens,
-                "completionTokens": response.usage.completion_tokens,
-                "totalTokens": response.usage.total_tokens
-            }
-        )
-        
-        # Close client properly with error handling
-        try:
-            await client.close()
-        except Exception as close_error:
-            logger.warning(f"Chat fallback client close error (non-critical): {close_error}")
-        return result
-    except Exception as e:
-        logger.error(f"Chat fallback error: {e}")
-        # Ensure client cleanup even on error
-        try:
-            if 'client' in locals():
-                await client.close()
-        except Exception as close_error:
-            logger.warning(f"Chat fallback error cleanup client close (non-critical): {close_error}")
-        raise HTTPException(status_code=500, detail=str(e))
+        yield sse(error_data)
+
+# Markdown -> docx conversion (module level so helpers aren't rebuilt per export)
+def _add_markdown_runs(p, text):
+    """Append text to paragraph p as runs, applying **bold** / *italic* formatting."""
+    for kind, run_text in _iter_md_runs(text):
+        run = p.add_run(run_text)
+        if kind == 'bold':
+            run.bold = True
+        elif kind == 'italic':
+            run.italic = True
+
+def add_markdown_paragraph(doc, md_line):
+    """Add a paragraph with bold/italic markdown formatting (all occurrences), including for list items."""
+    # If this is a bullet point, use List Bullet style
+    is_bullet = md_line.startswith('- ') or md_line.startswith('* ')
+    text = md_line[2:] if is_bullet else md_line
+    p = doc.add_paragraph(style='List Bullet' if is_bullet else None)
+    _add_markdown_runs(p, text)
+    return p
+
+def add_markdown_to_cell(cell, text):
+    """Apply markdown bold/italic to a table cell."""
+    cell.text = ''  # Clear default
+    _add_markdown_runs(cell.paragraphs[0], text)
+
+def _is_table_row(stripped):
+    """Table row check; expects an already-stripped line."""
+    return len(stripped) >= 2 and stripped[0] == '|' and stripped[-1] == '|'
+
+def markdown_to_docx(doc, markdown):
+    """Render the generated PRD markdown (headings, bullets, tables, paragraphs) into doc."""
+    lines = markdown.split('\n')
+    n = len(lines)
+    i = 0
+    prd_title_added = False  # Track if we've added the generated by text
+    
+    while i < n:
+        line = lines[i].strip()
+        # Skip blank lines and lines that are just '---' (markdown horizontal rules)
+        if not line or line == '---':
+            i += 1
+            continue
+        # Dispatch on the first token: '#'/'##'/'###' headings, '-'/'*' bullets
+        head, sep, rest = line.partition(' ')
+        level = _HEADING_LEVELS.get(head) if sep else None
+        if level is not None:
+            doc.add_heading(rest, level=level)
+            # Add "Generated by Explo Chat-PRD" right after the main title
+            if level == 1 and not prd_title_added and 'Product Requirements Document' in line:
+                doc.add_paragraph('Generated by Explo Chat-PRD').alignment = 1  # Center align
+                prd_title_added = True
+        elif sep and head in _BULLET_MARKERS:
+            add_markdown_paragraph(doc, line)
+        elif _is_table_row(line):
+            # Parse markdown table
+            header_cells = [cell.strip() for cell in line.strip('|').split('|')]
+            i += 1
+            # Skip divider
+            while i < n and _TABLE_DIVIDER.match(lines[i]):
+                i += 1
+            # Collect rows
+            table_rows = []
+            while i < n:
+                stripped = lines[i].strip()
+                if not _is_table_row(stripped):
+                    break
+                table_rows.append([cell.strip() for cell in stripped.strip('|').split('|')])
+                i += 1
+            # Add table to docx
+            cols = len(header_cells)
+            table = doc.add_table(rows=1, cols=cols)
+            table.style = 'Table Grid'
+            for j, cell in enumerate(header_cells):
+                add_markdown_to_cell(table.cell(0, j), cell)
+            for row in table_rows:
+                row_cells = table.add_row().cells
+                # Extra cells beyond the header width are dropped
+                for j, cell in enumerate(row[:cols]):
+                    add_markdown_to_cell(row_cells[j], cell)
+            continue  # already incremented i
+        else:
+            add_markdown_paragraph(doc, line)
+        i += 1
 
-@app.post("/export")
-async def export_prd(request: ExportRequest):
-    """Export PRD functionality (simplified version of existing)"""
-    try:
-        if len(request.conversation) <= 1:
-            raise HTTPException(status_code=400, detail="No conversation to export")
-        
-        api_key = await get_openai_key()
-        client = openai.AsyncOpenAI(api_key=api_key)
-        
-        # Create PRD generation prompt
-        conversation_text = "\n".join([
-            f"{msg.role.upper()}: {msg.content}" 
-            for msg in request.conversation 
-            if msg.role != 'system'
-        ])
-        
-        # Use enhanced prompt structure similar to functions/main.py
-        prd_context = f"""CONVERSATION DATA:\n{conversation_text}"""
-        
-        prd_prompt = prd_context + """
+# Prompt templates (static parts, built once)
+_PRD_TEMPLATE_TAIL = """
 
 Generate a comprehensive Product Requirements Document (PRD) in markdown format using these exact sections in this order:
 
@@ -406,6 +623,182 @@ What we are NOT building in this version.
 Optional: Include an FAQ when helpful to answer high level questions so it is easier for people to grasp the point of the project without getting lost in the details of product definition. 
 """
 
+# PRD sections the extractor maintains: key -> (prompt description, lowercase keywords that mark a turn as touching it)
+# Mirrored in functions/main.py PRD_SECTION_KEYWORDS; tests/test_prd_sections.py checks they agree
+PRD_SECTIONS = {
+    'executiveSummary': ("Brief overview of what we're building",
+                         ('overview', 'summary', 'vision', 'idea', 'building', 'product')),
+    'problemStatement': ('Problems being solved, pain points',
+                         ('problem', 'pain', 'struggle', 'frustrat', 'challenge', 'issue')),
+    'goals': ('Objectives and success criteria',
+              ('goal', 'objective', 'achieve', 'outcome', 'purpose')),
+    'targetUsers': ('User personas, segments, characteristics',
+                    ('users', 'persona', 'customer', 'audience', 'segment', 'admin', 'team')),
+    'userStories': ('User journeys, use cases, "As a user" stories',
+                    ('as a', 'story', 'stories', 'journey', 'use case', 'flow', 'scenario')),
+    'features': ('Specific features and functionality',
+                 ('feature', 'functionality', 'capabilit', 'integrat', 'dashboard', 'screen', 'support')),
+    'technicalConsiderations': ('Tech requirements, constraints, architecture',
+                                ('technical', 'architecture', 'api', 'database', 'stack', 'infra',
+                                 'scal', 'security', 'privacy', 'performance', 'constraint')),
+    'successMetrics': ('KPIs, measurement criteria',
+                       ('metric', 'kpi', 'measure', 'success', 'retention', 'conversion', 'adoption', '%')),
+    'timeline': ('Milestones, deadlines, phases',
+                 ('timeline', 'milestone', 'deadline', 'phase', 'launch', 'mvp', 'beta', 'release',
+                  'week', 'month', 'quarter')),
+    'outOfScope': ("What we're NOT building",
+                   ('out of scope', 'not build', "won't", 'exclude', 'non-goal', 'later', 'future')),
+}
+
+_PRD_EXTRACTION_HEADER = 'You are updating an existing PRD with new information from a conversation. \n\nEXISTING PRD SECTIONS:\n'
+_PRD_EXTRACTION_CONVERSATION = '\n\nNEW CONVERSATION TO ANALYZE:\n'
+
+_PRD_EXTRACTION_STEPS = """INSTRUCTIONS:
+1. Review the EXISTING PRD sections above
+2. Analyze the NEW CONVERSATION for relevant information
+3. For each PRD section below, intelligently merge new info with existing info:
+   - If new info conflicts with existing, prioritize NEW information
+   - If new info adds to existing, combine them intelligently
+   - If no new info for a section, return the existing content unchanged
+   - If neither exists, return null
+
+PRD SECTIONS TO UPDATE:
+"""
+
+_PRD_EXTRACTION_FOOTER = """
+
+Return ONLY valid JSON with the COMPLETE updated sections (not just changes):
+{"sectionName": "complete updated content or existing content or null"}
+
+JSON:"""
+
+_PRD_SECTION_LINES = {key: f"- {key}: {desc}" for key, (desc, _) in PRD_SECTIONS.items()}
+
+def mentioned_sections(conversation_text: str) -> List[str]:
+    """Return the PRD sections whose keywords appear in the conversation (cheap pre-filter before the LLM merge)"""
+    text = conversation_text.lower()
+    return [key for key, (_, keywords) in PRD_SECTIONS.items() if any(kw in text for kw in keywords)]
+
+# Token budget for the existing PRD content sent in one extraction call
+CHUNK_BUDGET = 1500
+
+def chunk_prd_sections(sections: List[str], existing_prd: dict) -> List[List[str]]:
+    """Group sections, in order, so each group's existing content stays under CHUNK_BUDGET tokens"""
+    groups, current, current_tokens = [], [], 0
+    for key in sections:
+        value = existing_prd.get(key) or ''
+        tokens = estimate_tokens(value if isinstance(value, str) else json.dumps(value))
+        if current and current_tokens + tokens > CHUNK_BUDGET:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(key)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+def build_prd_extraction_prompt(sections: List[str], existing_prd: dict, conversation_text: str) -> str:
+    """Build the merge prompt for just the given sections and their existing values"""
+    existing = {key: existing_prd[key] for key in sections if key in existing_prd}
+    return ''.join((
+        _PRD_EXTRACTION_HEADER,
+        orjson.dumps(existing, option=orjson.OPT_INDENT_2).decode() if existing else "No existing PRD data",
+        _PRD_EXTRACTION_CONVERSATION,
+        conversation_text,
+        "\n\n",
+        _PRD_EXTRACTION_STEPS,
+        "\n".join(_PRD_SECTION_LINES[key] for key in sections),
+        _PRD_EXTRACTION_FOOTER
+    ))
+
+# API endpoints
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest, batch: int = 1):
+    """Streaming chat endpoint using Server-Sent Events"""
+    try:
+        # Prepare messages for OpenAI (most recent context within the token budget)
+        messages = build_prompt_messages(request.conversation)
+        
+        if not messages:
+            raise HTTPException(status_code=400, detail="No valid messages in conversation")
+        
+        # Identical resubmissions (e.g. client retries) replay the cached completion
+        cache_key = response_cache_key(messages)
+        cached = get_cached_response(cache_key)
+        if cached is not None:
+            stream = replay_cached_response(cached)
+        else:
+            stream = stream_openai_response(messages, batch=bool(batch), cache_key=cache_key)
+        
+        return StreamingResponse(
+            stream,
+            media_type="text/event-stream",
+            headers={
+                "Cache-Control": "no-cache",
+                "Connection": "keep-alive",
+                "X-Accel-Buffering": "no",  # Disable Nginx buffering
+                "Access-Control-Allow-Origin": "*",
+                "Access-Control-Allow-Headers": "*",
+            }
+        )
+    except Exception as e:
+        logger.error(f"Streaming endpoint error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat_fallback(request: ChatRequest):
+    """Fallback non-streaming endpoint for compatibility"""
+    try:
+        client = await get_openai_client()
+        
+        # Prepare messages
+        messages = build_prompt_messages(request.conversation)
+        
+        if not messages:
+            raise HTTPException(status_code=400, detail="No valid messages in conversation")
+        
+        # Create completion
+        response = await client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=messages,
+            max_tokens=2048,
+            temperature=0.7
+        )
+        
+        result = ChatResponse(
+            response=response.choices[0].message.content,
+            tokenUsage={
+                "promptTokens": response.usage.prompt_tokens,
+                "completionTokens": response.usage.completion_tokens,
+                "totalTokens": response.usage.total_tokens
+            }
+        )
+        return result
+    except Exception as e:
+        logger.error(f"Chat fallback error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/export")
+async def export_prd(request: ExportRequest, download: int = 0):
+    """Export PRD functionality (simplified version of existing)"""
+    try:
+        if len(request.conversation) <= 1:
+            raise HTTPException(status_code=400, detail="No conversation to export")
+        
+        client = await get_openai_client()
+        
+        # Create PRD generation prompt
+        conversation_text = "\n".join([
+            f"{msg.role.upper()}: {msg.content}" 
+            for msg in request.conversation 
+            if msg.role != 'system'
+        ])
+        
+        # Use enhanced prompt structure similar to functions/main.py
+        prd_context = f"""CONVERSATION DATA:\n{conversation_text}"""
+        
+        prd_prompt = prd_context + _PRD_TEMPLATE_TAIL
+
         # Generate PRD content
         response = await client.chat.completions.create(
             model="gpt-4o-mini",
@@ -416,149 +809,45 @@ Optional: Include an FAQ when helpful to answer high level questions so it is ea
         
         prd_content = response.choices[0].message.content
         
-        # Close client properly with error handling
-        try:
-            await client.close()
-        except Exception as close_error:
-            logger.warning(f"Export error cleanup client close (non-critical): {close_error}")
-        
-        # Create Word document
+        # Create Word document (python-docx is only needed here, so import lazily)
+        from docx import Document
         doc = Document()
         # Don't add a separate title page - let the AI content provide the main heading
         
-        def add_markdown_paragraph(md_line):
-            """Add a paragraph with bold/italic markdown formatting (all occurrences), including for list items."""
-            # If this is a bullet point, use List Bullet style
-            is_bullet = md_line.startswith('- ') or md_line.startswith('* ')
-            text = md_line[2:] if is_bullet else md_line
-            p = doc.add_paragraph(style='List Bullet' if is_bullet else None)
-            pos = 0
-            import re
-            for match in re.finditer(r'(\*\*[^*]+\*\*|\*[^*]+\*)', text):
-                start, end = match.span()
-                if start > pos:
-                    p.add_run(text[pos:start])
-                mtext = match.group(0)
-                if mtext.startswith('**') and mtext.endswith('**'):
-                    run = p.add_run(mtext[2:-2])
-                    run.bold = True
-                elif mtext.startswith('*') and mtext.endswith('*'):
-                    run = p.add_run(mtext[1:-1])
-                    run.italic = True
-                pos = end
-            if pos < len(text):
-                p.add_run(text[pos:])
-            return p
-
-        def add_markdown_to_cell(cell, text):
-            """Apply markdown bold/italic to a table cell."""
-            cell.text = ''  # Clear default
-            p = cell.paragraphs[0]
-            pos = 0
-            import re
-            for match in re.finditer(r'(\*\*[^*]+\*\*|\*[^*]+\*)', text):
-                start, end = match.span()
-                if start > pos:
-                    p.add_run(text[pos:start])
-                mtext = match.group(0)
-                if mtext.startswith('**') and mtext.endswith('**'):
-                    run = p.add_run(mtext[2:-2])
-                    run.bold = True
-                elif mtext.startswith('*') and mtext.endswith('*'):
-                    run = p.add_run(mtext[1:-1])
-                    run.italic = True
-                pos = end
-            if pos < len(text):
-                p.add_run(text[pos:])
-
-        # Table parsing helpers
-        def is_table_divider(line):
-            import re
-            return re.match(r'^\|?\s*-+\s*\|', line)
-        def is_table_row(line):
-            return line.strip().startswith('|') and line.strip().endswith('|')
-        
-        # Enhanced markdown to Word conversion
-        lines = prd_content.split('\n')
-        i = 0
-        prd_title_added = False  # Track if we've added the generated by text
-        
-        while i < len(lines):
-            line = lines[i].strip()
-            # Remove lines that are just '---' (markdown horizontal rules)
-            if line == '---':
-                i += 1
-                continue
-            if not line:
-                i += 1
-                continue
-            elif line.startswith('# '):
-                doc.add_heading(line[2:], level=1)
-                # Add "Generated by Explo Chat-PRD" right after the main title
-                if not prd_title_added and 'Product Requirements Document' in line:
-                    doc.add_paragraph('Generated by Explo Chat-PRD').alignment = 1  # Center align
-                    prd_title_added = True
-            elif line.startswith('## '):
-                doc.add_heading(line[3:], level=2)
-            elif line.startswith('### '):
-                doc.add_heading(line[4:], level=3)
-            elif (line.startswith('- ') or line.startswith('* ')):
-                add_markdown_paragraph(line)
-            elif is_table_row(line):
-                # Parse markdown table
-                header_cells = [cell.strip() for cell in line.strip('|').split('|')]
-                i += 1
-                # Skip divider
-                while i < len(lines) and is_table_divider(lines[i]):
-                    i += 1
-                # Collect rows
-                table_rows = []
-                while i < len(lines) and is_table_row(lines[i]):
-                    row_cells = [cell.strip() for cell in lines[i].strip('|').split('|')]
-                    table_rows.append(row_cells)
-                    i += 1
-                # Add table to docx
-                table = doc.add_table(rows=1, cols=len(header_cells))
-                table.style = 'Table Grid'
-                for j, cell in enumerate(header_cells):
-                    add_markdown_to_cell(table.cell(0, j), cell)
-                for row in table_rows:
-                    row_cells = table.add_row().cells
-                    for j, cell in enumerate(row):
-                        if j < len(row):
-                            add_markdown_to_cell(row_cells[j], cell)
-                continue  # already incremented i
-            else:
-                add_markdown_paragraph(line)
-            i += 1
+        markdown_to_docx(doc, prd_content)
         
-        # Save to temporary file
-        temp_filename = f"PRD_{int(time.time())}.docx"
-        temp_path = os.path.join(tempfile.gettempdir(), temp_filename)
-        doc.save(temp_path)
+        # Serialize the document in memory (no tempfile round-trip)
+        file_name = f"PRD_{int(time.time())}.docx"
+        docx_buffer = io.BytesIO()
+        doc.save(docx_buffer)
+        
+        # ?download=1: send the file in this response and skip the storage round-trip
+        if download:
+            return Response(
+                content=docx_buffer.getvalue(),
+                media_type=DOCX_MIME_TYPE,
+                headers={"Content-Disposition": f'attachment; filename="{file_name}"'}
+            )
         
         # Upload to Google Cloud Storage with public access (no signed URL needed)
         if storage_client:
             try:
                 bucket_name = f'{PROJECT_ID}.firebasestorage.app'
                 bucket = storage_client.bucket(bucket_name)
-                blob_path = f'exports/{temp_filename}'
+                blob_path = f'exports/{file_name}'
                 blob = bucket.blob(blob_path)
                 
                 # Upload file
-                blob.upload_from_filename(temp_path)
+                await asyncio.to_thread(blob.upload_from_file, docx_buffer, rewind=True, content_type=DOCX_MIME_TYPE)
                 
                 # Make blob publicly readable
-                blob.make_public()
+                await asyncio.to_thread(blob.make_public)
                 
                 # Use public URL instead of signed URL
                 download_url = blob.public_url
                 
-                # Clean up temp file
-                os.remove(temp_path)
-                
                 logger.info(f"File uploaded successfully: {download_url}")
-                return {"downloadURL": download_url, "fileName": temp_filename}
+                return {"downloadURL": download_url, "fileName": file_name}
                 
             except Exception as storage_error:
                 logger.error(f"Storage upload failed: {storage_error}")
@@ -566,35 +855,27 @@ Optional: Include an FAQ when helpful to answer high level questions so it is ea
                 # Alternative: Return base64 encoded file for small files
                 try:
                     import base64
-                    with open(temp_path, 'rb') as f:
-                        file_data = f.read()
+                    file_data = docx_buffer.getvalue()
                     
                     # Only if file is small enough (< 1MB)
                     if len(file_data) < 1024 * 1024:
                         encoded_data = base64.b64encode(file_data).decode('utf-8')
-                        os.remove(temp_path)  # Clean up temp file
                         
                         return {
                             "downloadData": encoded_data,
-                            "fileName": temp_filename,
-                            "mimeType": "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+                            "fileName": file_name,
+                            "mimeType": DOCX_MIME_TYPE
                         }
                 except Exception as fallback_error:
                     logger.error(f"Fallback encoding failed: {fallback_error}")
                 
-                # Final fallback: return error with local file reference
-                return {"error": "Storage upload failed", "localFile": temp_path}
+                # Final fallback: return error
+                return {"error": "Storage upload failed"}
         else:
-            return {"error": "Storage not configured", "localFile": temp_path}
+            return {"error": "Storage not configured"}
             
     except Exception as e:
         logger.error(f"Export error: {e}")
-        # Ensure client cleanup even on error
-        try:
-            if 'client' in locals():
-                await client.close()
-        except Exception as close_error:
-            logger.warning(f"Export error cleanup client close (non-critical): {close_error}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/optimize")
@@ -607,7 +888,7 @@ async def optimize_conversation(request: OptimizeRequest):
             raise HTTPException(status_code=400, detail="No conversation to optimize")
         
         # Convert Pydantic models to dict for processing
-        conversation = [{"role": msg.role, "content": msg.content} for msg in request.conversation]
+        conversation = [msg.model_dump() for msg in request.conversation]
         total_tokens = request.totalTokens
         
         # Extract conversation text (excluding system messages for analysis)
@@ -622,17 +903,19 @@ async def optimize_conversation(request: OptimizeRequest):
         
         logger.info(f"Optimizing conversation with {len(conversation)} messages, ~{original_tokens} tokens, user reported {total_tokens} tokens")
         
-        # Step 1: Extract PRD-relevant information
-        prd_data = await extract_prd_information(conversation_text)
+        # Steps 1 & 2: Extract PRD-relevant information and summarize the conversation
+        # (independent OpenAI calls on the same input, so run them concurrently)
+        prd_data, conversation_summary = await asyncio.gather(
+            extract_prd_information(conversation_text),
+            summarize_conversation(conversation_text)
+        )
         
-        # Step 2: Update PRD storage file
+        # Step 3: Update PRD storage file
         await update_prd_storage(prd_data, total_tokens)
         
-        # Step 3: Create conversation summary
-        conversation_summary = await summarize_conversation(conversation_text)
-        
         # Step 4: Create optimized conversation with system prompt + summary
-        system_prompt = conversation[0] if conversation[0]['role'] == 'system' else {
+        # Shallow-copy the incoming system prompt so the response doesn't alias the input
+        system_prompt = dict(conversation[0]) if conversation[0]['role'] == 'system' else {
             'role': 'system',
             'content': 'You are an expert Product Manager AI assistant designed to help users build Product Requirements Documents (PRDs).'
         }
@@ -655,10 +938,7 @@ async def optimize_conversation(request: OptimizeRequest):
         logger.info(f"Optimization complete: {len(conversation)} → {len(optimized_conversation)} messages, ~{original_tokens} → ~{optimized_tokens} tokens")
         
         return {
-            'optimizedConversation': [
-                {"role": msg["role"], "content": msg["content"]} 
-                for msg in optimized_conversation
-            ],
+            'optimizedConversation': optimized_conversation,
             'originalMessages': len(conversation),
             'optimizedMessages': len(optimized_conversation),
             'originalTokens': max(original_tokens, total_tokens),  # Use the higher estimate
@@ -672,10 +952,21 @@ async def optimize_conversation(request: OptimizeRequest):
         logger.error(f"Optimization failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Optimization error: {str(e)}")
 
+# ISO timestamp cache, refreshed at most once per second: [epoch_second, iso_string]
+_ts_cache = [0, ""]
+
+def _current_timestamp() -> str:
+    """Return the current local time as ISO 8601, reusing the string within the same second"""
+    now = int(time.time())
+    if now != _ts_cache[0]:
+        _ts_cache[0] = now
+        _ts_cache[1] = datetime.fromtimestamp(now).isoformat()
+    return _ts_cache[1]
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
+    return {"status": "healthy", "timestamp": _current_timestamp()}
 
 @app.get("/warmup")
 async def warmup():
@@ -693,16 +984,13 @@ async def warmup():
         
         # Test OpenAI API key availability (but don't fail if not available)
         try:
-            if os.environ.get('OPENAI_API_KEY'):
-                # If API key is in environment, test client creation
-                import httpx
-                http_client = httpx.AsyncClient(
-                    timeout=30.0,
-                    limits=httpx.Limits(max_keepalive_connections=5, max_connections=10)
-                )
-                await http_client.aclose()  # Just test creation and close
+            if app.state.openai_client is not None or os.environ.get('OPENAI_API_KEY'):
+                # Make sure the shared client exists and open its connection so the first chat skips setup
+                client = await get_openai_client()
+                models_response = await client.models.with_raw_response.list()
                 services_status["openai"] = "ready"
-                logger.info("OpenAI client initialization test successful")
+                services_status["openai_http_version"] = models_response.http_response.http_version
+                logger.info(f"OpenAI client initialization test successful ({models_response.http_response.http_version})")
             else:
                 services_status["openai"] = "no_api_key"
         except Exception as openai_error:
@@ -714,7 +1002,7 @@ async def warmup():
         
         return {
             "status": "warmed_up", 
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": _current_timestamp(),
             "warmup_time": warmup_time,
             "services": services_status
         }
@@ -723,7 +1011,7 @@ async def warmup():
         return {
             "status": "warmup_failed", 
             "error": str(e),
-            "timestamp": datetime.now().isoformat()
+            "timestamp": _current_timestamp()
         }
 
 @app.get("/")
@@ -734,10 +1022,29 @@ async def root():
 # Optimization helper functions
 def estimate_conversation_tokens(conversation: List[Dict[str, str]]) -> int:
     """Estimate the total number of tokens in a conversation"""
-    token_count = 0
-    for msg in conversation:
-        token_count += len(msg['content'].split())
-    return token_count
+    return sum(estimate_tokens(msg['content']) for msg in conversation)
+
+# Last-seen text of the prd_data blobs: {blob name: (generation, text)}
+_BLOB_CACHE: Dict[str, tuple] = {}
+
+async def read_blob_cached(blob) -> str | None:
+    """Return a blob's text (None if it doesn't exist), re-downloading only when its generation changed"""
+    try:
+        # Metadata-only request
+        await asyncio.to_thread(blob.reload)
+    except NotFound:
+        _BLOB_CACHE.pop(blob.name, None)
+        return None
+    cached = _BLOB_CACHE.get(blob.name)
+    if cached and cached[0] == blob.generation:
+        return cached[1]
+    text = await asyncio.to_thread(blob.download_as_text)
+    _BLOB_CACHE[blob.name] = (blob.generation, text)
+    return text
+
+def remember_blob(blob, text: str):
+    """Record text this process just uploaded; the upload response carries the new generation"""
+    _BLOB_CACHE[blob.name] = (blob.generation, text)
 
 async def extract_prd_information(conversation_text: str) -> dict:
     """Extract PRD-relevant information from conversation using AI, intelligently merging with existing PRD"""
@@ -750,8 +1057,8 @@ async def extract_prd_information(conversation_text: str) -> dict:
             bucket = storage_client.bucket(bucket_name)
             blob = bucket.blob('prd_data/current_prd.json')
             
-            if blob.exists():
-                existing_json = blob.download_as_text()
+            existing_json = await read_blob_cached(blob)
+            if existing_json is not None:
                 existing_data = json.loads(existing_json)
                 existing_prd = existing_data.get('sections', {})
                 logger.info(f"Loaded existing PRD with {len(existing_prd)} sections for intelligent merge")
@@ -760,109 +1067,57 @@ async def extract_prd_information(conversation_text: str) -> dict:
     except Exception as e:
         logger.info(f"Could not load existing PRD: {str(e)}")
     
-    # Create smart extraction prompt that includes existing PRD context
-    prd_extraction_prompt = f"""You are updating an existing PRD with new information from a conversation. 
-
-EXISTING PRD SECTIONS:
-{json.dumps(existing_prd, indent=2) if existing_prd else "No existing PRD data"}
-
-NEW CONVERSATION TO ANALYZE:
-{conversation_text}
-
-INSTRUCTIONS:
-1. Review the EXISTING PRD sections above
-2. Analyze the NEW CONVERSATION for relevant information
-3. For each PRD section below, intelligently merge new info with existing info:
-   - If new info conflicts with existing, prioritize NEW information
-   - If new info adds to existing, combine them intelligently
-   - If no new info for a section, return the existing content unchanged
-   - If neither exists, return null
-
-PRD SECTIONS TO UPDATE:
-- executiveSummary: Brief overview of what we're building
-- problemStatement: Problems being solved, pain points
-- goals: Objectives and success criteria  
-- targetUsers: User personas, segments, characteristics
-- userStories: User journeys, use cases, "As a user" stories
-- features: Specific features and functionality
-- technicalConsiderations: Tech requirements, constraints, architecture
-- successMetrics: KPIs, measurement criteria
-- timeline: Milestones, deadlines, phases
-- outOfScope: What we're NOT building
-
-Return ONLY valid JSON with the COMPLETE updated sections (not just changes):
-{{"sectionName": "complete updated content or existing content or null"}}
+    # Only sections the new turn mentions go to the model; the rest keep their stored values.
+    # A fresh PRD has nothing to keep, so every section is extracted.
+    sections = mentioned_sections(conversation_text) if existing_prd else list(PRD_SECTIONS)
+    if not sections:
+        logger.info("Conversation mentions no PRD sections, keeping existing PRD unchanged")
+        return {}
+    logger.info(f"Merging {len(sections)}/{len(PRD_SECTIONS)} PRD sections: {', '.join(sections)}")
+    
+    # Large PRDs are merged in section groups, one smaller call per group, run concurrently
+    groups = chunk_prd_sections(sections, existing_prd)
+    results = await asyncio.gather(*(
+        extract_prd_sections(group, existing_prd, conversation_text) for group in groups
+    ))
+    
+    merged = {}
+    for result in results:
+        merged.update(result)
+    return merged
 
-JSON:"""
+async def extract_prd_sections(sections: List[str], existing_prd: dict, conversation_text: str) -> dict:
+    """Run one extraction call for a group of sections; a failed group leaves its sections unchanged"""
+    prd_extraction_prompt = build_prd_extraction_prompt(sections, existing_prd, conversation_text)
 
     try:
-        api_key = await get_openai_key()
+        client = await get_openai_client()
         
-        response = requests.post(
-            'https://api.openai.com/v1/chat/completions',
-            headers={
-                'Content-Type': 'application/json',
-                'Authorization': f'Bearer {api_key}'
-            },
-            json={
-                'model': 'gpt-4o-mini',
-                'messages': [{'role': 'user', 'content': prd_extraction_prompt}],
-                'max_tokens': 2048,
-                'temperature': 0.15
-            },
+        # JSON mode guarantees a bare JSON object, so no code-fence stripping is needed
+        response = await client.chat.completions.create(
+            model='gpt-4o-mini',
+            messages=[{'role': 'user', 'content': prd_extraction_prompt}],
+            max_tokens=2048,
+            temperature=0.15,
+            response_format={'type': 'json_object'},
             timeout=30
         )
         
-        if response.status_code == 200:
-            result = response.json()
-            extracted_text = result['choices'][0]['message']['content']
-            
-            # Clean and parse JSON
-            extracted_text = extracted_text.strip()
-            if extracted_text.startswith('```json'):
-                extracted_text = extracted_text[7:-3]
-            elif extracted_text.startswith('```'):
-                extracted_text = extracted_text[3:-3]
-                
-            return json.loads(extracted_text)
-        else:
-            logger.error(f"PRD extraction failed: {response.status_code}")
-            return {}
+        # Drop anything outside the requested sections so unmentioned ones are never overwritten
+        extracted = json.loads(response.choices[0].message.content)
+        return {key: value for key, value in extracted.items() if key in sections}
             
+    except openai.APIStatusError as e:
+        logger.error(f"PRD extraction failed: {e.status_code}")
+        return {}
     except Exception as e:
         logger.error(f"PRD extraction error: {str(e)}")
         return {}
 
-async def summarize_conversation(conversation_text: str) -> str:
-    """Create a cumulative summary building on previous summary + new conversation"""
-    
-    # Load existing summary from storage
-    existing_summary = ""
-    try:
-        if storage_client:
-            bucket_name = f'{PROJECT_ID}.firebasestorage.app'
-            bucket = storage_client.bucket(bucket_name)
-            blob = bucket.blob('prd_data/conversation_summary.txt')
-            
-            if blob.exists():
-                existing_summary = blob.download_as_text()
-                logger.info(f"Loaded existing summary ({len(existing_summary)} chars) for intelligent merge")
-            else:
-                logger.info("No existing summary found, creating first summary")
-    except Exception as e:
-        logger.info(f"Could not load existing summary: {str(e)}")
-    
-    # Create intelligent summary merging prompt
-    if existing_summary.strip():
-        summary_prompt = f"""You are updating a cumulative conversation summary with new information.
-
-EXISTING SUMMARY:
-{existing_summary}
-
-NEW CONVERSATION SINCE LAST SUMMARY:
-{conversation_text}
-
-INSTRUCTIONS:
+# Summary prompts (static parts, built once per instance)
+_SUMMARY_MERGE_HEADER = 'You are updating a cumulative conversation summary with new information.\n\nEXISTING SUMMARY:\n'
+_SUMMARY_MERGE_CONVERSATION = '\n\nNEW CONVERSATION SINCE LAST SUMMARY:\n'
+_SUMMARY_MERGE_INSTRUCTIONS = """INSTRUCTIONS:
 1. Review the EXISTING SUMMARY above  
 2. Analyze the NEW CONVERSATION for additional relevant information
 3. Create an UPDATED SUMMARY that intelligently merges both:
@@ -881,8 +1136,8 @@ Focus on:
 
 Keep bullets short; preserve explicit numbers, dates, decisions.
 UPDATED SUMMARY:"""
-    else:
-        summary_prompt = f"""Summarize this conversation into key points for PRD context. Focus on:
+
+_SUMMARY_FRESH_INSTRUCTIONS = """Summarize this conversation into key points for PRD context. Focus on:
 
 - Key decisions and requirements discussed
 - User needs and problems identified  
@@ -895,52 +1150,70 @@ Keep it concise but comprehensive (max 1000 words).
 Keep bullets short; preserve explicit numbers, dates, decisions.
 
 CONVERSATION:
-{conversation_text}
+"""
+_SUMMARY_FRESH_FOOTER = '\n\nSUMMARY:'
 
-SUMMARY:"""
+async def summarize_conversation(conversation_text: str) -> str:
+    """Create a cumulative summary building on previous summary + new conversation"""
+    
+    # One blob handle for both the load and the save-back below
+    summary_blob = None
+    if storage_client:
+        summary_blob = storage_client.bucket(f'{PROJECT_ID}.firebasestorage.app').blob('prd_data/conversation_summary.txt')
+    
+    # Load existing summary from storage
+    existing_summary = ""
+    try:
+        if summary_blob:
+            cached_summary = await read_blob_cached(summary_blob)
+            if cached_summary is not None:
+                existing_summary = cached_summary
+                logger.info(f"Loaded existing summary ({len(existing_summary)} chars) for intelligent merge")
+            else:
+                logger.info("No existing summary found, creating first summary")
+    except Exception as e:
+        logger.info(f"Could not load existing summary: {str(e)}")
+    
+    # Create intelligent summary merging prompt
+    if existing_summary.strip():
+        summary_prompt = ''.join((_SUMMARY_MERGE_HEADER, existing_summary, _SUMMARY_MERGE_CONVERSATION, conversation_text, "\n\n", _SUMMARY_MERGE_INSTRUCTIONS))
+    else:
+        summary_prompt = ''.join((_SUMMARY_FRESH_INSTRUCTIONS, conversation_text, _SUMMARY_FRESH_FOOTER))
 
     try:
-        api_key = await get_openai_key()
+        client = await get_openai_client()
         
-        response = requests.post(
-            'https://api.openai.com/v1/chat/completions',
-            headers={
-                'Content-Type': 'application/json',
-                'Authorization': f'Bearer {api_key}'
-            },
-            json={
-                'model': 'gpt-4o-mini',
-                'messages': [{'role': 'user', 'content': summary_prompt}],
-                'max_tokens': 1024,
-                'temperature': 0.15
-            },
+        response = await client.chat.completions.create(
+            model='gpt-4o-mini',
+            messages=[{'role': 'user', 'content': summary_prompt}],
+            max_tokens=1024,
+            temperature=0.15,
             timeout=30
         )
         
-        if response.status_code == 200:
-            result = response.json()
-            updated_summary = result['choices'][0]['message']['content']
-            
-            # Save updated summary back to storage
-            try:
-                if storage_client:
-                    bucket_name = f'{PROJECT_ID}.firebasestorage.app'
-                    bucket = storage_client.bucket(bucket_name)
-                    blob = bucket.blob('prd_data/conversation_summary.txt')
-                    blob.upload_from_string(updated_summary, content_type='text/plain')
-                    logger.info(f"Updated summary saved ({len(updated_summary)} chars)")
-            except Exception as e:
-                logger.error(f"Failed to save updated summary: {str(e)}")
-            
-            return updated_summary
-        else:
-            logger.error(f"Summary generation failed: {response.status_code}")
-            return existing_summary if existing_summary else "Previous conversation covered PRD planning and requirements."
+        updated_summary = response.choices[0].message.content
+        
+        # Save updated summary back to storage
+        try:
+            if summary_blob:
+                await asyncio.to_thread(summary_blob.upload_from_string, updated_summary, content_type='text/plain')
+                remember_blob(summary_blob, updated_summary)
+                logger.info(f"Updated summary saved ({len(updated_summary)} chars)")
+        except Exception as e:
+            logger.error(f"Failed to save updated summary: {str(e)}")
+        
+        return updated_summary
             
+    except openai.APIStatusError as e:
+        logger.error(f"Summary generation failed: {e.status_code}")
+        return existing_summary if existing_summary else "Previous conversation covered PRD planning and requirements."
     except Exception as e:
         logger.error(f"Summary error: {str(e)}")
         return existing_summary if existing_summary else "Previous conversation covered PRD planning and requirements."
 
+# Write attempts for the PRD blob: the first plus one fresh read-and-merge after losing a race
+PRD_WRITE_ATTEMPTS = 2
+
 async def update_prd_storage(prd_data: dict, total_tokens: int):
     """Update PRD storage file with new information"""
     
@@ -954,37 +1227,56 @@ async def update_prd_storage(prd_data: dict, total_tokens: int):
         bucket = storage_client.bucket(bucket_name)
         blob = bucket.blob('prd_data/current_prd.json')
         
-        # Try to load existing data
-        existing_data = {}
-        try:
-            if blob.exists():
-                existing_json = blob.download_as_text()
-                existing_data = json.loads(existing_json)
-                logger.info(f"Loaded existing PRD data: {len(existing_data.get('sections', {}))} sections")
-        except Exception as e:
-            logger.info(f"No existing PRD data found: {str(e)}")
-        
-        # Merge new data with existing
-        updated_data = {
-            'lastUpdated': datetime.datetime.utcnow().isoformat(),
-            'totalTokens': total_tokens,
-            'version': existing_data.get('version', 0) + 1,
-            'sections': existing_data.get('sections', {})
+        # Replace each section that has content with the AI-merged version (no appending)
+        merged_sections = {
+            section: new_info for section, new_info in prd_data.items()
+            if isinstance(new_info, str) and new_info.strip() and new_info.strip().lower() != 'null'
         }
         
-        # Update each section with new information
-        for section, new_info in prd_data.items():
-            if new_info and new_info.strip() and new_info.lower() != 'null':
-                # Replace the section entirely with AI-merged content (no appending)
-                updated_data['sections'][section] = new_info
-                logger.info(f"Updated section '{section}' with merged content")
-        
-        # Save updated data
-        blob.upload_from_string(
-            json.dumps(updated_data, indent=2),
-            content_type='application/json'
-        )
+        for attempt in range(1, PRD_WRITE_ATTEMPTS + 1):
+            # Load existing data; the generation we read is the precondition for our write
+            existing_data = {}
+            try:
+                existing_json = await read_blob_cached(blob)
+                if existing_json is not None:
+                    existing_data = json.loads(existing_json)
+                    read_generation = blob.generation
+                    logger.info(f"Loaded existing PRD data: {len(existing_data.get('sections', {}))} sections")
+                else:
+                    read_generation = 0  # object must not exist yet
+            except Exception as e:
+                # Without a read generation the write would be unconditional and drop every other stored section
+                logger.error(f"Could not read existing PRD, skipping update: {str(e)}")
+                return
+            
+            # Merge new data with existing
+            updated_data = {
+                'lastUpdated': datetime.utcnow().isoformat(),
+                'totalTokens': total_tokens,
+                'version': existing_data.get('version', 0) + 1,
+                'sections': {**existing_data.get('sections', {}), **merged_sections}
+            }
+            
+            # Save updated data; if_generation_match fails instead of overwriting a concurrent writer's update.
+            # Stored gzip-encoded: download_as_text/bytes decompress it transparently.
+            updated_json = json.dumps(updated_data, indent=2)
+            blob.content_encoding = 'gzip'
+            try:
+                await asyncio.to_thread(
+                    blob.upload_from_string,
+                    gzip.compress(updated_json.encode(), compresslevel=6),
+                    content_type='application/json',
+                    if_generation_match=read_generation
+                )
+            except PreconditionFailed:
+                if attempt == PRD_WRITE_ATTEMPTS:
+                    raise
+                logger.info("PRD changed since it was read, re-reading and merging again")
+                continue
+            break
         
+        remember_blob(blob, updated_json)
+        logger.info(f"Updated {len(merged_sections)} sections with merged content: {', '.join(merged_sections)}")
         logger.info(f"PRD data updated: version {updated_data['version']}, {len(updated_data['sections'])} sections")
         
     except Exception as e:
@@ -5,55 +5,83 @@ Test script for streaming functionality
 import asyncio
 import aiohttp
 import json
+import sys
+import time
 
-async def test_streaming():
-    """Test the streaming endpoint"""
-    print("🧪 Testing Streaming Endpoint...")
-    
+BASE_URL = "http://localhost:8080"
+
+# Prompts streamed concurrently over one shared session
+TEST_PROMPTS = [
+    "Hello! Can you tell me a short story about a cat?",
+    "Give me three ideas for a note-taking app feature.",
+    "Summarize what a PRD is in two sentences.",
+]
+
+async def test_streaming(session, prompt):
+    """Test the streaming endpoint with a single prompt"""
     # Test data
     test_data = {
         "conversation": [
-            {"role": "user", "content": "Hello! Can you tell me a short story about a cat?"}
+            {"role": "user", "content": prompt}
         ]
     }
-    
-    async with aiohttp.ClientSession() as session:
-        try:
-            # Test streaming endpoint
-            async with session.post(
-                'http://localhost:8080/chat/stream',
-                json=test_data,
-                headers={'Accept': 'text/event-stream'}
-            ) as response:
-                print(f"📡 Status: {response.status}")
-                
-                if response.status == 200:
-                    print("✅ Streaming response received!")
-                    print("📝 Content:")
-                    
-                    # Read the streaming response
-                    async for line in response.content:
-                        line = line.decode('utf-8').strip()
-                        if line.startswith('data: '):
-                            data = line[6:]  # Remove 'data: ' prefix
-                            if data == '[DONE]':
-                                print("🏁 Stream completed!")
-                                break
-                            try:
-                                chunk = json.loads(data)
-                                if 'choices' in chunk and chunk['choices']:
-                                    content = chunk['choices'][0].get('delta', {}).get('content', '')
-                                    if content:
-                                        print(f"   {content}", end='', flush=True)
-                            except json.JSONDecodeError:
-                                continue
-                else:
-                    print(f"❌ Error: {response.status}")
-                    text = await response.text()
-                    print(f"Response: {text}")
-                    
-        except Exception as e:
-            print(f"❌ Connection error: {e}")
+
+    start_time = time.time()
+    chunks = 0
+    content = []
+    try:
+        # Test streaming endpoint
+        async with session.post(
+            f'{BASE_URL}/chat/stream',
+            json=test_data,
+            headers={'Accept': 'text/event-stream'}
+        ) as response:
+            if response.status != 200:
+                text = await response.text()
+                print(f"❌ Error for '{prompt[:30]}...': {response.status} - {text}")
+                return False
+
+            # Read the streaming response
+            async for line in response.content:
+                line = line.decode('utf-8').strip()
+                if line.startswith('data: '):
+                    data = line[6:]  # Remove 'data: ' prefix
+                    if data == '[DONE]':
+                        break
+                    try:
+                        chunk = json.loads(data)
+                    except json.JSONDecodeError:
+                        continue
+                    if chunk.get('type') == 'chunk':
+                        chunks += 1
+                        content.append(chunk.get('content', ''))
+                    elif chunk.get('type') == 'error':
+                        print(f"❌ Stream error for '{prompt[:30]}...': {chunk.get('content')}")
+                        return False
+
+        text = ''.join(content)
+        print(f"✅ '{prompt[:30]}...': {chunks} chunks, {len(text)} chars in {time.time() - start_time:.2f}s")
+        print(f"   {text[:100]}...")
+        return True
+
+    except Exception as e:
+        print(f"❌ Connection error for '{prompt[:30]}...': {e}")
+        return False
+
+async def main():
+    """Stream all test prompts concurrently over a shared keep-alive session"""
+    print(f"🧪 Testing Streaming Endpoint with {len(TEST_PROMPTS)} concurrent streams...")
+
+    connector = aiohttp.TCPConnector(limit=50, keepalive_timeout=60)
+    start_time = time.time()
+    async with aiohttp.ClientSession(connector=connector) as session:
+        results = await asyncio.gather(*(test_streaming(session, prompt) for prompt in TEST_PROMPTS))
+
+    passed = sum(results)
+    print(f"🏁 {passed}/{len(results)} streams completed in {time.time() - start_time:.2f}s")
+    return passed == len(results)
 
 if __name__ == "__main__":
-    asyncio.run(test_streaming()) 
\ No newline at end of file
+    if len(sys.argv) > 1:
+        BASE_URL = sys.argv[1]
+    sys.exit(0 if asyncio.run(main()) else 1)
@@ -1,22 +1,49 @@
 import os
-import json
+import gzip
+import orjson
 import requests
-import tempfile
-import base64
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import io
 import datetime
+import secrets
+import hashlib
+import threading
+import time
+import logging
+import sys
 from firebase_functions import https_fn
 from firebase_functions import options
 from google.cloud import storage
-from docx import Document
-import firebase_functions
+from google.api_core.exceptions import NotFound, PreconditionFailed
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from dataclasses import dataclass, field
 from google.auth import impersonated_credentials
-from google.auth.transport.requests import Request
 import google.auth
 import re
+import tiktoken
 
 # Define project constants first
 PROJECT_ID = 'explo-website-tools'
 SERVICE_ACCOUNT_EMAIL = '142797649545-compute@developer.gserviceaccount.com'
+DOCX_MIME_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+
+class _CloudLoggingFormatter(logging.Formatter):
+    """One JSON object per line on stdout; Cloud Logging picks up severity and message from it"""
+    def format(self, record):
+        return orjson.dumps({
+            'severity': record.levelname,
+            'message': f"[ADMIN-LOG] {record.getMessage()}"
+        }).decode()
+
+# Admin log: %-style arguments are only formatted when the level is enabled
+logger = logging.getLogger('admin')
+logger.setLevel(logging.INFO)
+logger.propagate = False
+_log_handler = logging.StreamHandler(sys.stdout)
+_log_handler.setFormatter(_CloudLoggingFormatter())
+logger.addHandler(_log_handler)
 
 # Get OpenAI API key from Secret Manager
 def get_openai_api_key():
@@ -28,7 +55,7 @@ def get_openai_api_key():
                   os.environ.get('FUNCTIONS_CONFIG_OPENAI_KEY'))
         
         if api_key:
-            print(f"[ADMIN-LOG] ✓ API key loaded from environment variables")
+            logger.info("✓ API key loaded from environment variables")
             return api_key
         
         # Try Secret Manager
@@ -43,11 +70,11 @@ def get_openai_api_key():
             response = secret_client.access_secret_version(request={"name": secret_name})
             api_key = response.payload.data.decode("UTF-8")
             
-            print(f"[ADMIN-LOG] ✓ API key loaded from Secret Manager")
+            logger.info("✓ API key loaded from Secret Manager")
             return api_key
             
         except Exception as secret_error:
-            print(f"[ADMIN-LOG] Secret Manager failed: {str(secret_error)}")
+            logger.warning("Secret Manager failed: %s", secret_error)
         
         # Try Firebase Functions config (the working method from before)
         try:
@@ -55,34 +82,176 @@ def get_openai_api_key():
             config = firebase_functions.config()
             api_key = config.get('openai', {}).get('key')
             if api_key:
-                print(f"[ADMIN-LOG] ✓ API key loaded from Firebase config")
+                logger.info("✓ API key loaded from Firebase config")
                 return api_key
         except Exception as config_error:
-            print(f"[ADMIN-LOG] Firebase config failed: {str(config_error)}")
+            logger.warning("Firebase config failed: %s", config_error)
         
         # Fallback: try environment variable for Firebase config (legacy)
         try:
             api_key = os.environ.get('OPENAI_API_KEY')
             if api_key:
-                print(f"[ADMIN-LOG] ✓ API key loaded from OPENAI_API_KEY env var")
+                logger.info("✓ API key loaded from OPENAI_API_KEY env var")
                 return api_key
         except Exception as env_error:
-            print(f"[ADMIN-LOG] Environment variable fallback failed: {str(env_error)}")
+            logger.warning("Environment variable fallback failed: %s", env_error)
         
-        print(f"[ADMIN-LOG] ✗ No API key found in any source")
+        logger.error("✗ No API key found in any source")
         return None
         
     except Exception as e:
-        print(f"[ADMIN-LOG] Error loading OpenAI API key: {e}")
+        logger.error("Error loading OpenAI API key: %s", e)
         return None
 
-# Load the API key
-OPENAI_API_KEY = get_openai_api_key()
+# Shared HTTP session for OpenAI calls: warm instances reuse pooled keep-alive connections
+OPENAI_CHAT_URL = 'https://api.openai.com/v1/chat/completions'
+_SESSION = requests.Session()
+# Once retries are exhausted the last response is returned (raise_on_status=False), so callers
+# still see OpenAI's status code and error body instead of a bare RetryError
+_SESSION.mount('https://', HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=10,
+    max_retries=Retry(
+        total=2,
+        # Never resend after a read timeout: the completion may still be generating (and billed),
+        # and a resend could outlast the function's timeout_sec. Connect errors and statuses still retry.
+        read=0,
+        backoff_factor=0.2,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=['POST'],
+        raise_on_status=False
+    )
+))
+_SESSION.headers.update({'Content-Type': 'application/json'})
+
+# Module-level caches reused across warm invocations of the same instance
+_CACHE_LOCK = threading.Lock()
+OPENAI_API_KEY = None
+OPENAI_API_KEY_TTL = 3600  # seconds
+_OPENAI_API_KEY_EXPIRY = 0.0
+SIGNING_CREDS_LIFETIME = 3600  # seconds, lifetime of the impersonated signing token
+_SIGNING_CREDS = None
+_SIGNING_CREDS_EXPIRY = 0.0
+_SIGNING_CLIENT = None
+_STORAGE_CLIENT = None
+_BUCKET = None
+
+def openai_api_key():
+    """Return the OpenAI API key, resolving it again at most once per OPENAI_API_KEY_TTL.
+
+    Loaded on first use rather than at import, so cold starts and CORS preflights
+    never wait on Secret Manager.
+    """
+    global OPENAI_API_KEY, _OPENAI_API_KEY_EXPIRY
+    if time.monotonic() >= _OPENAI_API_KEY_EXPIRY:
+        with _CACHE_LOCK:
+            if time.monotonic() >= _OPENAI_API_KEY_EXPIRY:
+                OPENAI_API_KEY = get_openai_api_key()
+                logger.info("OpenAI API Key status: %s", '✓ Loaded' if OPENAI_API_KEY else '✗ Missing')
+                if OPENAI_API_KEY:
+                    _SESSION.headers['Authorization'] = f'Bearer {OPENAI_API_KEY}'
+                    _OPENAI_API_KEY_EXPIRY = time.monotonic() + OPENAI_API_KEY_TTL
+    return OPENAI_API_KEY
+
+def get_bucket():
+    """Return the shared Firebase Storage bucket handle (default credentials)"""
+    global _STORAGE_CLIENT, _BUCKET
+    if _BUCKET is None:
+        with _CACHE_LOCK:
+            if _BUCKET is None:
+                _STORAGE_CLIENT = storage.Client()
+                _BUCKET = _STORAGE_CLIENT.bucket(f'{PROJECT_ID}.firebasestorage.app')
+    return _BUCKET
+
+def get_signing_credentials():
+    """Return impersonated signing credentials and a storage client using them, rebuilt 5 minutes before expiry"""
+    global _SIGNING_CREDS, _SIGNING_CREDS_EXPIRY, _SIGNING_CLIENT
+    with _CACHE_LOCK:
+        if _SIGNING_CREDS is None or _SIGNING_CREDS_EXPIRY < time.monotonic() + 300:
+            # Get default credentials (from Cloud Functions environment)
+            source_credentials, _ = google.auth.default()
+            
+            # Create impersonated credentials for signing
+            _SIGNING_CREDS = impersonated_credentials.Credentials(
+                source_credentials=source_credentials,
+                target_principal=SERVICE_ACCOUNT_EMAIL,
+                target_scopes=['https://www.googleapis.com/auth/cloud-platform'],
+                delegates=[],
+                lifetime=SIGNING_CREDS_LIFETIME
+            )
+            _SIGNING_CLIENT = storage.Client(credentials=_SIGNING_CREDS)
+            _SIGNING_CREDS_EXPIRY = time.monotonic() + SIGNING_CREDS_LIFETIME
+        return _SIGNING_CREDS, _SIGNING_CLIENT
+
+# Worker threads for independent storage round-trips within one invocation
+_IO_POOL = ThreadPoolExecutor(max_workers=8)
+
+# Last-seen decoded contents of the prd_data blobs: {blob name: (generation, value)}.
+# Values are shared across invocations and must be treated as read-only.
+_BLOB_CACHE = {}
 
-print(f"OpenAI API Key status: {'✓ Loaded' if OPENAI_API_KEY else '✗ Missing'}")
-if OPENAI_API_KEY:
-    print(f"API Key length: {len(OPENAI_API_KEY)} characters")
-    print(f"API Key starts with: {OPENAI_API_KEY[:10]}...")
+def read_blob_cached(blob, decode):
+    """Return decode(blob bytes), or None if the blob doesn't exist.
+
+    A metadata-only reload checks the generation; the download and decode are skipped when it
+    matches what this instance last read or wrote.
+    """
+    try:
+        blob.reload()
+    except NotFound:
+        _BLOB_CACHE.pop(blob.name, None)
+        return None
+    cached = _BLOB_CACHE.get(blob.name)
+    if cached and cached[0] == blob.generation:
+        return cached[1]
+    # The download response headers refresh blob.generation if the object changed since the reload
+    value = decode(blob.download_as_bytes())
+    _BLOB_CACHE[blob.name] = (blob.generation, value)
+    return value
+
+def remember_blob(blob, value):
+    """Record the decoded value this instance just uploaded; the upload response carries the new generation"""
+    _BLOB_CACHE[blob.name] = (blob.generation, value)
+
+def _decode_prd_sections(raw: bytes) -> dict:
+    return orjson.loads(raw).get('sections', {})
+
+def load_prd_and_summary():
+    """Fetch the stored PRD sections and cumulative summary concurrently.
+
+    Returns (prd_sections, summary); a missing or unreadable blob yields {} or "".
+    """
+    prd_sections = {}
+    summary = ""
+    try:
+        bucket = get_bucket()
+        prd_future = _IO_POOL.submit(read_blob_cached, bucket.blob('prd_data/current_prd.json'), _decode_prd_sections)
+        summary_future = _IO_POOL.submit(read_blob_cached, bucket.blob('prd_data/conversation_summary.txt'), bytes.decode)
+    except Exception as e:
+        logger.warning("Could not load accumulated data: %s", e)
+        return prd_sections, summary
+    
+    try:
+        existing_sections = prd_future.result()
+        if existing_sections is not None:
+            prd_sections = existing_sections
+            logger.info("Loaded existing PRD with %s sections", len(prd_sections))
+        else:
+            logger.info("No existing PRD found")
+    except Exception as e:
+        logger.warning("Could not load existing PRD: %s", e)
+    
+    try:
+        summary_text = summary_future.result()
+        if summary_text is not None:
+            summary = summary_text
+            logger.info("Loaded existing summary (%s chars)", len(summary))
+        else:
+            logger.info("No existing summary found")
+    except Exception as e:
+        logger.warning("Could not load existing summary: %s", e)
+    
+    return prd_sections, summary
 
 def generate_secure_signed_url(bucket_name: str, blob_name: str, expiration_hours: int = 2) -> str:
     """
@@ -100,21 +269,10 @@ def generate_secure_signed_url(bucket_name: str, blob_name: str, expiration_hour
         Exception: If signing fails
     """
     try:
-        print(f"[ADMIN-LOG] Generating signed URL for: {blob_name}")
-        
-        # Get default credentials (from Cloud Functions environment)
-        source_credentials, _ = google.auth.default()
-        
-        # Create impersonated credentials for signing
-        target_credentials = impersonated_credentials.Credentials(
-            source_credentials=source_credentials,
-            target_principal=SERVICE_ACCOUNT_EMAIL,
-            target_scopes=['https://www.googleapis.com/auth/cloud-platform'],
-            delegates=[]
-        )
+        logger.info("Generating signed URL for: %s", blob_name)
         
-        # Initialize storage client with impersonated credentials
-        client = storage.Client(credentials=target_credentials)
+        # Impersonated credentials and their storage client are cached across invocations
+        target_credentials, client = get_signing_credentials()
         bucket = client.bucket(bucket_name)
         blob = bucket.blob(blob_name)
         
@@ -126,95 +284,231 @@ def generate_secure_signed_url(bucket_name: str, blob_name: str, expiration_hour
             credentials=target_credentials
         )
         
-        print(f"[ADMIN-LOG] ✓ Signed URL generated successfully, expires in {expiration_hours}h")
+        logger.info("✓ Signed URL generated successfully, expires in %sh", expiration_hours)
         return signed_url
         
     except Exception as e:
-        print(f"[ADMIN-LOG] ✗ Failed to generate signed URL: {str(e)}")
+        logger.error("✗ Failed to generate signed URL: %s", e)
         raise Exception(f"URL signing failed: {str(e)}")
 
-@https_fn.on_request(cors=options.CorsOptions(cors_origins="*", cors_methods=["GET", "POST"]))
+# Chat context budget: a leading system prompt plus the newest messages that fit
+MAX_PROMPT_TOKENS = 6000
+_MESSAGE_OVERHEAD_TOKENS = 4  # role/separator tokens OpenAI adds per message
+_VALID_ROLES = frozenset({'system', 'user', 'assistant'})
+
+# The BPE file is fetched from openaipublic on first use; if that fails, counts fall back to
+# a chars/4 estimate and the load is retried after TOKEN_ENCODING_RETRY_S
+TOKEN_ENCODING_RETRY_S = 300
+_TOKEN_ENCODING = None
+_TOKEN_ENCODING_RETRY_AT = 0.0
+
+def _token_encoding():
+    """o200k_base BPE used by the gpt-4o / gpt-4.1 family, or None while it can't be loaded"""
+    global _TOKEN_ENCODING, _TOKEN_ENCODING_RETRY_AT
+    if _TOKEN_ENCODING is None and time.monotonic() >= _TOKEN_ENCODING_RETRY_AT:
+        try:
+            _TOKEN_ENCODING = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            _TOKEN_ENCODING_RETRY_AT = time.monotonic() + TOKEN_ENCODING_RETRY_S
+            logger.warning("⚠ Could not load tiktoken encoding, estimating tokens as chars/4: %s", e)
+    return _TOKEN_ENCODING
+
+def count_text_tokens(texts: list) -> list:
+    """Token count of each text (chars/4 estimate if the encoding is unavailable)"""
+    encoding = _token_encoding()
+    if encoding is None:
+        return [len(text) // 4 for text in texts]
+    return [len(tokens) for tokens in encoding.encode_batch(texts, disallowed_special=())]
+
+def count_message_tokens(content: str) -> int:
+    """Tokens one message costs in the prompt"""
+    encoding = _token_encoding()
+    tokens = len(content) // 4 if encoding is None else len(encoding.encode(content, disallowed_special=()))
+    return tokens + _MESSAGE_OVERHEAD_TOKENS
+
+def build_prompt_messages(conversation: list) -> list:
+    """Most recent messages that fit in MAX_PROMPT_TOKENS, oldest first; a leading system prompt is always kept"""
+    valid = [msg for msg in conversation if msg.get('role') in _VALID_ROLES]
+    if not valid:
+        return []
+    head = [{'role': 'system', 'content': valid[0]['content']}] if valid[0]['role'] == 'system' else []
+    budget = MAX_PROMPT_TOKENS - sum(count_message_tokens(msg['content']) for msg in head)
+    
+    # Walk newest to oldest; the newest message is always included
+    tail = []
+    for msg in reversed(valid[len(head):]):
+        cost = count_message_tokens(msg['content'])
+        if tail and cost > budget:
+            break
+        tail.append({'role': msg['role'], 'content': msg['content']})
+        budget -= cost
+    tail.reverse()
+    return head + tail
+
+def iter_stream_deltas(openai_response):
+    """Yield the content deltas of a streamed (stream=True) chat completion as they arrive"""
+    for line in openai_response.iter_lines(decode_unicode=True):
+        if not line or not line.startswith('data: '):
+            continue
+        data = line[6:]
+        if data == '[DONE]':
+            break
+        choices = orjson.loads(data).get('choices')
+        if not choices:
+            continue
+        content = choices[0].get('delta', {}).get('content')
+        if content:
+            yield content
+
+_SSE_PREFIX = b"data: "
+_SSE_SUFFIX = b"\n\n"
+_SSE_DONE = b"data: [DONE]\n\n"
+
+def sse(payload: dict) -> bytes:
+    """Encode one Server-Sent Events data frame"""
+    return _SSE_PREFIX + orjson.dumps(payload) + _SSE_SUFFIX
+
+def relay_chat_stream(openai_response):
+    """Yield OpenAI streaming deltas as {type, content} SSE events (same framing as the Cloud Run service)"""
+    try:
+        for content in iter_stream_deltas(openai_response):
+            yield sse({'type': 'chunk', 'content': content})
+        yield sse({'type': 'complete'})
+        yield _SSE_DONE
+    except Exception as e:
+        logger.error("✗ Chat stream failed: %s", e)
+        yield sse({'type': 'error', 'content': f'Streaming error: {str(e)}'})
+    finally:
+        openai_response.close()
+
+# Shared request prologue for the HTTP handlers
+_PREFLIGHT_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'POST, OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type',
+    'Access-Control-Max-Age': '3600'
+}
+_JSON_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Content-Type': 'application/json'
+}
+_MISSING_KEY_ERROR = 'OpenAI API key not configured. Please set up Firebase config with: firebase functions:config:set openai.key="your-api-key"'
+
+# Bodies smaller than this aren't worth compressing
+GZIP_MIN_BYTES = 1024
+
+def _json_response(req, payload, status=200):
+    """JSON response, gzip-compressed when the client accepts it and the body is large enough"""
+    body = orjson.dumps(payload)
+    if len(body) >= GZIP_MIN_BYTES and 'gzip' in req.headers.get('Accept-Encoding', ''):
+        return https_fn.Response(
+            gzip.compress(body, compresslevel=6),
+            headers={**_JSON_HEADERS, 'Content-Encoding': 'gzip', 'Vary': 'Accept-Encoding'},
+            status=status
+        )
+    return https_fn.Response(body, headers={**_JSON_HEADERS, 'Vary': 'Accept-Encoding'}, status=status)
+
+def _handle_preflight(req):
+    """Return the CORS preflight response for OPTIONS requests, otherwise None"""
+    if req.method == 'OPTIONS':
+        return https_fn.Response('', headers=_PREFLIGHT_HEADERS, status=204)
+    return None
+
+def _parse_conversation(req, min_messages=1, empty_error='No conversation provided', key_error=_MISSING_KEY_ERROR):
+    """Parse the JSON body and check the OpenAI API key.
+
+    Returns (request_json, conversation, None), or (None, None, error_response) when the request can't proceed.
+    """
+    request_json = req.get_json(silent=True)
+    if not request_json:
+        return None, None, _json_response(req, {'error': 'Invalid JSON'}, status=400)
+    
+    conversation = request_json.get('conversation', [])
+    if not conversation or len(conversation) < min_messages:
+        return None, None, _json_response(req, {'error': empty_error}, status=400)
+    
+    # Check if OpenAI API key is available
+    if not openai_api_key():
+        logger.error("%s", key_error)
+        return None, None, _json_response(req, {'error': key_error}, status=500)
+    
+    return request_json, conversation, None
+
+# Near-pure I/O: small instances, high concurrency so the shared session and caches are reused
+@https_fn.on_request(
+    cors=options.CorsOptions(cors_origins="*", cors_methods=["GET", "POST"]),
+    timeout_sec=45,
+    memory=options.MemoryOption.MB_256,
+    cpu=1,
+    concurrency=80
+)
 def chat_simple(req: https_fn.Request) -> https_fn.Response:
     """New simplified chat function - direct OpenAI API calls"""
     
     # Handle CORS preflight
-    if req.method == 'OPTIONS':
-        headers = {
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Methods': 'POST, OPTIONS',
-            'Access-Control-Allow-Headers': 'Content-Type',
-            'Access-Control-Max-Age': '3600'
-        }
-        return https_fn.Response('', headers=headers, status=204)
-    
-    headers = {
-        'Access-Control-Allow-Origin': '*', 
-        'Content-Type': 'application/json'
-    }
+    preflight = _handle_preflight(req)
+    if preflight is not None:
+        return preflight
     
     try:
-        # Parse request
-        request_json = req.get_json(silent=True)
-        if not request_json:
-            return https_fn.Response(json.dumps({'error': 'Invalid JSON'}), headers=headers, status=400)
-            
-        conversation = request_json.get('conversation', [])
-        if not conversation:
-            return https_fn.Response(json.dumps({'error': 'No conversation provided'}), headers=headers, status=400)
-        
-        # Check if OpenAI API key is available
-        if not OPENAI_API_KEY:
-            error_msg = 'OpenAI API key not configured. Please set up Firebase config with: firebase functions:config:set openai.key="your-api-key"'
-            print(f"ERROR: {error_msg}")
-            return https_fn.Response(json.dumps({'error': error_msg}), headers=headers, status=500)
-        
-        # Prepare conversation for OpenAI API format (much simpler!)
-        openai_messages = []
-        for msg in conversation[-20:]:  # Last 20 messages for context
-            if msg['role'] in ['system', 'user', 'assistant']:
-                openai_messages.append({
-                    'role': msg['role'],
-                    'content': msg['content']
-                })
+        # Parse request and check the OpenAI API key
+        request_json, conversation, error = _parse_conversation(req)
+        if error is not None:
+            return error
+        
+        # Prepare conversation for OpenAI API format (newest messages within the token budget)
+        openai_messages = build_prompt_messages(conversation)
+        
+        # Clients that send "stream": true get deltas relayed as Server-Sent Events
+        stream = bool(request_json.get('stream'))
         
         # Call OpenAI API directly
         try:
-            openai_response = requests.post(
-                'https://api.openai.com/v1/chat/completions',
-                headers={
-                    'Content-Type': 'application/json',
-                    'Authorization': f'Bearer {OPENAI_API_KEY}'
-                },
+            openai_response = _SESSION.post(
+                OPENAI_CHAT_URL,
                 json={
                     'model': 'gpt-4.1-mini',
                     'messages': openai_messages,
                     'max_tokens': 2048,
-                    'temperature': 0.7
+                    'temperature': 0.7,
+                    'stream': stream
                 },
-                timeout=30  # Add timeout
+                timeout=30,  # Add timeout (between chunks when streaming)
+                stream=stream
             )
         except requests.exceptions.RequestException as e:
             error_msg = f"Failed to connect to OpenAI API: {str(e)}"
-            print(f"ERROR: {error_msg}")
-            return https_fn.Response(json.dumps({'error': error_msg}), headers=headers, status=500)
+            logger.error("%s", error_msg)
+            return _json_response(req, {'error': error_msg}, status=500)
         
-        if openai_response.status_code == 200:
+        if openai_response.status_code == 200 and stream:
+            return https_fn.Response(
+                relay_chat_stream(openai_response),
+                headers={
+                    'Access-Control-Allow-Origin': '*',
+                    'Cache-Control': 'no-cache',
+                    'X-Accel-Buffering': 'no'
+                },
+                content_type='text/event-stream',
+                status=200
+            )
+        elif openai_response.status_code == 200:
             result = openai_response.json()
             assistant_message = result['choices'][0]['message']['content']
             
             # Extract token usage information
             token_usage = result.get('usage', {})
             
-            print(f"[ADMIN-LOG] ✓ Chat response generated. Tokens: {token_usage.get('prompt_tokens', 'N/A')} prompt + {token_usage.get('completion_tokens', 'N/A')} completion = {token_usage.get('total_tokens', 'N/A')} total")
+            logger.info("✓ Chat response generated. Tokens: %s prompt + %s completion = %s total", token_usage.get('prompt_tokens', 'N/A'), token_usage.get('completion_tokens', 'N/A'), token_usage.get('total_tokens', 'N/A'))
             
-            return https_fn.Response(json.dumps({
+            return _json_response(req, {
                 'response': assistant_message,
                 'tokenUsage': {
                     'promptTokens': token_usage.get('prompt_tokens', 0),
                     'completionTokens': token_usage.get('completion_tokens', 0),
                     'totalTokens': token_usage.get('total_tokens', 0)
                 }
-            }), headers=headers, status=200)
+            })
         else:
             error_msg = f"OpenAI API error: {openai_response.status_code}"
             try:
@@ -222,96 +516,32 @@ def chat_simple(req: https_fn.Request) -> https_fn.Response:
                 error_msg += f" - {error_detail.get('error', {}).get('message', '')}"
             except:
                 pass
-            return https_fn.Response(json.dumps({'error': error_msg}), headers=headers, status=500)
+            return _json_response(req, {'error': error_msg}, status=500)
             
     except Exception as e:
-        return https_fn.Response(json.dumps({'error': f'Server error: {str(e)}'}), headers=headers, status=500)
+        return _json_response(req, {'error': f'Server error: {str(e)}'}, status=500)
 
-@https_fn.on_request(cors=options.CorsOptions(cors_origins="*", cors_methods=["GET", "POST"]))
-def export_simple(req: https_fn.Request) -> https_fn.Response:
-    """New simplified PRD export function using OpenAI"""
-    
-    # Handle CORS preflight
-    if req.method == 'OPTIONS':
-        headers = {
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Methods': 'POST, OPTIONS',
-            'Access-Control-Allow-Headers': 'Content-Type',
-            'Access-Control-Max-Age': '3600'
-        }
-        return https_fn.Response('', headers=headers, status=204)
-    
-    headers = {
-        'Access-Control-Allow-Origin': '*',
-        'Content-Type': 'application/json'
-    }
-    
-    try:
-        # Parse request
-        request_json = req.get_json(silent=True)
-        if not request_json:
-            return https_fn.Response(json.dumps({'error': 'Invalid JSON'}), headers=headers, status=400)
-            
-        conversation = request_json.get('conversation', [])
-        if not conversation:
-            return https_fn.Response(json.dumps({'error': 'No conversation provided'}), headers=headers, status=400)
-        
-        # Check if OpenAI API key is available
-        if not OPENAI_API_KEY:
-            error_msg = 'OpenAI API key not configured. Please set up Firebase config with: firebase functions:config:set openai.key="your-api-key"'
-            print(f"ERROR: {error_msg}")
-            return https_fn.Response(json.dumps({'error': error_msg}), headers=headers, status=500)
-        
-        # Load accumulated PRD data from storage
-        accumulated_prd = {}
-        accumulated_summary = ""
-        try:
-            client = storage.Client()
-            bucket = client.bucket(f'{PROJECT_ID}.firebasestorage.app')
-            
-            # Load PRD data
-            prd_blob = bucket.blob('prd_data/current_prd.json')
-            if prd_blob.exists():
-                existing_json = prd_blob.download_as_text()
-                existing_data = json.loads(existing_json)
-                accumulated_prd = existing_data.get('sections', {})
-                print(f"[ADMIN-LOG] Loaded accumulated PRD with {len(accumulated_prd)} sections for export")
-            
-            # Load conversation summary
-            summary_blob = bucket.blob('prd_data/conversation_summary.txt')
-            if summary_blob.exists():
-                accumulated_summary = summary_blob.download_as_text()
-                print(f"[ADMIN-LOG] Loaded accumulated summary ({len(accumulated_summary)} chars) for export")
-            
-            if not accumulated_prd and not accumulated_summary:
-                print(f"[ADMIN-LOG] No accumulated data found, using conversation only")
-                
-        except Exception as e:
-            print(f"[ADMIN-LOG] Could not load accumulated data: {str(e)}")
-        
-        # Get recent conversation (messages since last optimization)
-        recent_conversation_text = "\n".join([
-            f"{msg['role'].upper()}: {msg['content']}" 
-            for msg in conversation 
-            if msg['role'] != 'system'
-        ])
-        
-        # Create enhanced PRD generation prompt using all accumulated data + recent context
-        if accumulated_prd or accumulated_summary:
-            context_parts = []
-            if accumulated_prd:
-                context_parts.append(f"ACCUMULATED PRD SECTIONS:\n{json.dumps(accumulated_prd, indent=2)}")
-            if accumulated_summary:
-                context_parts.append(f"CONVERSATION HISTORY SUMMARY:\n{accumulated_summary}")
-            if recent_conversation_text.strip():
-                context_parts.append(f"RECENT CONVERSATION (since last optimization):\n{recent_conversation_text}")
-            else:
-                context_parts.append("RECENT CONVERSATION: No new messages since last optimization")
-            prd_context = f"""{chr(10).join(context_parts)}\n\nINSTRUCTIONS: Generate a comprehensive PRD using all the accumulated data above as the foundation. The PRD sections contain specific structured information, while the conversation summary provides broader context. Incorporate any relevant insights from recent conversation. Prioritize structured PRD data but enhance with conversational context.\n\nIMPORTANT: Do NOT include any reviewer signature tables or signature checklists. In the Problem Statement section, do NOT use boxes, borders, or tables—just use plain text/paragraphs for the content."""
-        else:
-            prd_context = f"""CONVERSATION DATA:\n{recent_conversation_text}"""
-        
-        prd_prompt = prd_context + """
+# Caps on accumulated context fed to the export prompt, so growing storage files can't balloon it
+MAX_SUMMARY_CHARS = 20000
+MAX_PRD_JSON_BYTES = 40000
+
+def bounded_prd_json(sections: dict) -> str:
+    """Compact JSON of the PRD sections, dropping the largest sections until it fits MAX_PRD_JSON_BYTES"""
+    prd_json = orjson.dumps(sections)
+    if len(prd_json) > MAX_PRD_JSON_BYTES:
+        kept = dict(sections)
+        for key, _ in sorted(sections.items(), key=lambda kv: -len(str(kv[1]))):
+            del kept[key]
+            logger.warning("⚠ Dropped PRD section '%s' from export prompt (accumulated PRD over %s bytes)", key, MAX_PRD_JSON_BYTES)
+            prd_json = orjson.dumps(kept)
+            if len(prd_json) <= MAX_PRD_JSON_BYTES:
+                break
+    return prd_json.decode()
+
+# Export prompt (static parts, built once per instance)
+_PRD_CONTEXT_INSTRUCTIONS = "\n\nINSTRUCTIONS: Generate a comprehensive PRD using all the accumulated data above as the foundation. The PRD sections contain specific structured information, while the conversation summary provides broader context. Incorporate any relevant insights from recent conversation. Prioritize structured PRD data but enhance with conversational context.\n\nIMPORTANT: Do NOT include any reviewer signature tables or signature checklists. In the Problem Statement section, do NOT use boxes, borders, or tables—just use plain text/paragraphs for the content."
+
+_PRD_PROMPT_SUFFIX = """
 
 Generate a comprehensive Product Requirements Document (PRD) in markdown format using these exact sections in this order:
 
@@ -394,14 +624,103 @@ Impact Checklist
 * Global
 """
 
+# Markdown -> docx helpers (module level so they aren't redefined per export; patterns compiled once)
+_MD_INLINE = re.compile(r'\*\*([^*]+)\*\*|\*([^*]+)\*')
+_TABLE_DIVIDER = re.compile(r'^\|?\s*-+\s*\|')
+_FENCE = re.compile(r'^```(?:markdown|md)?[ \t]*\n(.*?)(?:\n?```)?$', re.DOTALL)
+_HEADING_LEVELS = {'#': 1, '##': 2, '###': 3}
+_BULLET_MARKERS = frozenset({'-', '*'})
+
+def _add_md_runs(p, text):
+    """Append text to a paragraph as runs, applying **bold** and *italic* spans."""
+    pos = 0
+    for match in _MD_INLINE.finditer(text):
+        start = match.start()
+        if start > pos:
+            p.add_run(text[pos:start])
+        if match.lastindex == 1:
+            p.add_run(match.group(1)).bold = True
+        else:
+            p.add_run(match.group(2)).italic = True
+        pos = match.end()
+    if pos < len(text):
+        p.add_run(text[pos:])
+
+def add_markdown_paragraph(doc, md_line):
+    """Add a paragraph with bold/italic markdown formatting (all occurrences), including for list items."""
+    # If this is a bullet point, use List Bullet style
+    is_bullet = md_line.startswith('- ') or md_line.startswith('* ')
+    text = md_line[2:] if is_bullet else md_line
+    p = doc.add_paragraph(style='List Bullet' if is_bullet else None)
+    _add_md_runs(p, text)
+    return p
+
+def add_markdown_to_cell(cell, text):
+    """Apply markdown bold/italic to a table cell."""
+    cell.text = ''  # Clear default
+    _add_md_runs(cell.paragraphs[0], text)
+
+def _is_table_row(line):
+    """True for an already-stripped markdown table row."""
+    return line.startswith('|') and line.endswith('|')
+
+# 60s OpenAI timeout plus the docx build and upload, so the function limit needs headroom
+@https_fn.on_request(
+    cors=options.CorsOptions(cors_origins="*", cors_methods=["GET", "POST"]),
+    timeout_sec=120,
+    memory=options.MemoryOption.MB_512,
+    cpu=1,
+    concurrency=20
+)
+def export_simple(req: https_fn.Request) -> https_fn.Response:
+    """New simplified PRD export function using OpenAI"""
+    
+    # Handle CORS preflight
+    preflight = _handle_preflight(req)
+    if preflight is not None:
+        return preflight
+    
+    try:
+        # Parse request and check the OpenAI API key
+        request_json, conversation, error = _parse_conversation(req)
+        if error is not None:
+            return error
+        
+        # Load accumulated PRD data and conversation summary from storage (concurrently)
+        accumulated_prd, accumulated_summary = load_prd_and_summary()
+        if len(accumulated_summary) > MAX_SUMMARY_CHARS:
+            # Keep the most recent part of the cumulative summary
+            accumulated_summary = accumulated_summary[-MAX_SUMMARY_CHARS:]
+            logger.warning("⚠ Clipped accumulated summary to last %s chars for export", MAX_SUMMARY_CHARS)
+        if not accumulated_prd and not accumulated_summary:
+            logger.info("No accumulated data found, using conversation only")
+        
+        # Get recent conversation (messages since last optimization)
+        recent_conversation_text = "\n".join([
+            f"{msg['role'].upper()}: {msg['content']}" 
+            for msg in conversation 
+            if msg['role'] != 'system'
+        ])
+        
+        # Create enhanced PRD generation prompt using all accumulated data + recent context
+        if accumulated_prd or accumulated_summary:
+            context_parts = []
+            if accumulated_prd:
+                context_parts.append("ACCUMULATED PRD SECTIONS:\n" + bounded_prd_json(accumulated_prd))
+            if accumulated_summary:
+                context_parts.append(f"CONVERSATION HISTORY SUMMARY:\n{accumulated_summary}")
+            if recent_conversation_text.strip():
+                context_parts.append(f"RECENT CONVERSATION (since last optimization):\n{recent_conversation_text}")
+            else:
+                context_parts.append("RECENT CONVERSATION: No new messages since last optimization")
+            prd_prompt = "".join(("\n".join(context_parts), _PRD_CONTEXT_INSTRUCTIONS, _PRD_PROMPT_SUFFIX))
+        else:
+            prd_prompt = "".join(("CONVERSATION DATA:\n", recent_conversation_text, _PRD_PROMPT_SUFFIX))
+
         # Get PRD from OpenAI
         try:
-            openai_response = requests.post(
-                'https://api.openai.com/v1/chat/completions',
-                headers={
-                    'Content-Type': 'application/json',
-                    'Authorization': f'Bearer {OPENAI_API_KEY}'
-                },
+            openai_response = _SESSION.post(
+                OPENAI_CHAT_URL,
                 json={
                     'model': 'gpt-4.1',
                     'messages': [{'role': 'user', 'content': prd_prompt}],
@@ -412,147 +731,92 @@ Impact Checklist
             )
         except requests.exceptions.RequestException as e:
             error_msg = f"Failed to connect to OpenAI API: {str(e)}"
-            print(f"ERROR: {error_msg}")
-            return https_fn.Response(json.dumps({'error': error_msg}), headers=headers, status=500)
+            logger.error("%s", error_msg)
+            return _json_response(req, {'error': error_msg}, status=500)
         
         if openai_response.status_code != 200:
-            return https_fn.Response(json.dumps({'error': 'Failed to generate PRD'}), headers=headers, status=500)
+            return _json_response(req, {'error': 'Failed to generate PRD'}, status=500)
             
         result = openai_response.json()
         if 'choices' not in result or len(result['choices']) == 0:
-            return https_fn.Response(json.dumps({'error': 'No PRD generated'}), headers=headers, status=500)
+            return _json_response(req, {'error': 'No PRD generated'}, status=500)
             
         prd_markdown = result['choices'][0]['message']['content']
-        # Remove leading triple backticks (```markdown or ```) if present
+        # Remove a wrapping ```markdown / ``` fence if present (closing fence optional)
         prd_markdown = prd_markdown.strip()
-        if prd_markdown.startswith('```markdown'):
-            prd_markdown = prd_markdown[9:].strip()
-            if prd_markdown.startswith('\n'):
-                prd_markdown = prd_markdown[1:]
-            if prd_markdown.endswith('```'):
-                prd_markdown = prd_markdown[:-3].strip()
-        elif prd_markdown.startswith('```'):
-            prd_markdown = prd_markdown[3:].strip()
-            if prd_markdown.startswith('\n'):
-                prd_markdown = prd_markdown[1:]
-            if prd_markdown.endswith('```'):
-                prd_markdown = prd_markdown[:-3].strip()
-        
-        # Convert markdown to Word document
+        fenced = _FENCE.match(prd_markdown)
+        if fenced:
+            prd_markdown = fenced.group(1).strip()
+        
+        # Convert markdown to Word document (python-docx is only needed here, so it loads on first export)
+        from docx import Document
         doc = Document()
         doc.add_heading('Product Requirements Document', 0)
         doc.add_paragraph('Generated by Explo Chat-PRD')
         # Removed page break to avoid empty first page
 
-        def add_markdown_paragraph(md_line):
-            """Add a paragraph with bold/italic markdown formatting (all occurrences), including for list items."""
-            # If this is a bullet point, use List Bullet style
-            is_bullet = md_line.startswith('- ') or md_line.startswith('* ')
-            text = md_line[2:] if is_bullet else md_line
-            p = doc.add_paragraph(style='List Bullet' if is_bullet else None)
-            pos = 0
-            for match in re.finditer(r'(\*\*[^*]+\*\*|\*[^*]+\*)', text):
-                start, end = match.span()
-                if start > pos:
-                    p.add_run(text[pos:start])
-                mtext = match.group(0)
-                if mtext.startswith('**') and mtext.endswith('**'):
-                    run = p.add_run(mtext[2:-2])
-                    run.bold = True
-                elif mtext.startswith('*') and mtext.endswith('*'):
-                    run = p.add_run(mtext[1:-1])
-                    run.italic = True
-                pos = end
-            if pos < len(text):
-                p.add_run(text[pos:])
-            return p
-
-        def add_markdown_to_cell(cell, text):
-            """Apply markdown bold/italic to a table cell."""
-            cell.text = ''  # Clear default
-            p = cell.paragraphs[0]
-            pos = 0
-            for match in re.finditer(r'(\*\*[^*]+\*\*|\*[^*]+\*)', text):
-                start, end = match.span()
-                if start > pos:
-                    p.add_run(text[pos:start])
-                mtext = match.group(0)
-                if mtext.startswith('**') and mtext.endswith('**'):
-                    run = p.add_run(mtext[2:-2])
-                    run.bold = True
-                elif mtext.startswith('*') and mtext.endswith('*'):
-                    run = p.add_run(mtext[1:-1])
-                    run.italic = True
-                pos = end
-            if pos < len(text):
-                p.add_run(text[pos:])
-
-        # Table parsing helpers
-        def is_table_divider(line):
-            return re.match(r'^\|?\s*-+\s*\|', line)
-        def is_table_row(line):
-            return line.strip().startswith('|') and line.strip().endswith('|')
-        
-        lines = prd_markdown.split('\n')
+        # Strip every line once up front; the table scan below looks ahead through the same list
+        lines = [l.strip() for l in prd_markdown.split('\n')]
+        # Resolve the bullet style once rather than by name for every bullet line
+        bullet_style = doc.styles['List Bullet']
         i = 0
         while i < len(lines):
-            line = lines[i].strip()
-            # Remove lines that are just '---' (markdown horizontal rules)
-            if line == '---':
+            line = lines[i]
+            # Skip blank lines and lines that are just '---' (markdown horizontal rules)
+            if not line or line == '---':
                 i += 1
                 continue
-            if not line:
-                i += 1
-                continue
-            elif line.startswith('# '):
-                doc.add_heading(line[2:], level=1)
-            elif line.startswith('## '):
-                doc.add_heading(line[3:], level=2)
-            elif line.startswith('### '):
-                doc.add_heading(line[4:], level=3)
-            elif (line.startswith('- ') or line.startswith('* ')):
-                doc.add_paragraph(line[2:], style='List Bullet')
-            elif is_table_row(line):
+            # Dispatch on the first token: '#'/'##'/'###' headings, '-'/'*' bullets
+            head, sep, rest = line.partition(' ')
+            level = _HEADING_LEVELS.get(head) if sep else None
+            if level is not None:
+                doc.add_heading(rest, level=level)
+            elif sep and head in _BULLET_MARKERS:
+                doc.add_paragraph(rest, style=bullet_style)
+            elif line[0] == '|' and _is_table_row(line):
                 # Parse markdown table
                 header_cells = [cell.strip() for cell in line.strip('|').split('|')]
                 i += 1
                 # Skip divider
-                while i < len(lines) and is_table_divider(lines[i]):
+                while i < len(lines) and _TABLE_DIVIDER.match(lines[i]):
                     i += 1
                 # Collect rows
                 table_rows = []
-                while i < len(lines) and is_table_row(lines[i]):
+                while i < len(lines) and _is_table_row(lines[i]):
                     row_cells = [cell.strip() for cell in lines[i].strip('|').split('|')]
                     table_rows.append(row_cells)
                     i += 1
-                # Add table to docx
-                table = doc.add_table(rows=1, cols=len(header_cells))
+                # Add table to docx with every row allocated up front (add_row() per row rebuilds the grid)
+                cols = len(header_cells)
+                table = doc.add_table(rows=1 + len(table_rows), cols=cols)
                 table.style = 'Table Grid'
                 for j, cell in enumerate(header_cells):
                     add_markdown_to_cell(table.cell(0, j), cell)
-                for row in table_rows:
-                    row_cells = table.add_row().cells
-                    for j, cell in enumerate(row):
-                        add_markdown_to_cell(row_cells[j], cell)
+                for r, row in enumerate(table_rows, start=1):
+                    # Cells beyond the header width have no column to go in
+                    for j, cell in enumerate(row[:cols]):
+                        add_markdown_to_cell(table.cell(r, j), cell)
                 continue  # already incremented i
             else:
-                add_markdown_paragraph(line)
+                add_markdown_paragraph(doc, line)
             i += 1
         
-        # Save to temporary file
-        temp_filename = f"Explo_PRD_{os.urandom(8).hex()}.docx"
-        temp_path = os.path.join(tempfile.gettempdir(), temp_filename)
-        doc.save(temp_path)
+        # Serialize in memory (/tmp is RAM-backed on Cloud Functions, so a temp file would hold it twice)
+        # Timestamp prefix keeps exports sortable and lets lifecycle rules / cleanup work by age
+        file_name = f"Explo_PRD_{datetime.datetime.utcnow():%Y%m%dT%H%M%SZ}_{secrets.token_hex(4)}.docx"
+        docx_buffer = io.BytesIO()
+        doc.save(docx_buffer)
+        docx_buffer.seek(0)
+        docx_size = docx_buffer.getbuffer().nbytes
         
         # Upload to Firebase Storage with comprehensive error handling
         try:
-            print(f"[ADMIN-LOG] Starting file upload: {temp_filename}")
+            logger.info("Starting file upload: %s", file_name)
             
             # Standard storage client for upload (doesn't need signing permissions)
-            client = storage.Client()
-            bucket_name = f'{PROJECT_ID}.firebasestorage.app'
-            bucket = client.bucket(bucket_name)
-            blob_path = f'exports/{temp_filename}'
+            bucket = get_bucket()
+            bucket_name = bucket.name
+            blob_path = f'exports/{file_name}'
             blob = bucket.blob(blob_path)
             
             # Upload file with metadata for admin tracking
@@ -561,10 +825,14 @@ Impact Checklist
                 'conversation_length': str(len(conversation)),
                 'source': 'chat-prd-export'
             }
-            blob.upload_from_filename(temp_path)
+            blob.upload_from_file(
+                docx_buffer,
+                content_type=DOCX_MIME_TYPE,
+                size=docx_size
+            )
             
-            print(f"[ADMIN-LOG] ✓ File uploaded successfully: {blob_path}")
-            print(f"[ADMIN-LOG] File size: {blob.size} bytes")
+            logger.info("✓ File uploaded successfully: %s", blob_path)
+            logger.info("File size: %s bytes", docx_size)
             
             # Generate secure signed URL
             download_url = generate_secure_signed_url(
@@ -573,75 +841,53 @@ Impact Checklist
                 expiration_hours=4  # 4-hour expiration for user convenience
             )
             
-            print(f"[ADMIN-LOG] ✓ Export completed successfully for user")
+            logger.info("✓ Export completed successfully for user")
             
         except Exception as storage_error:
-            print(f"[ADMIN-LOG] ✗ Storage operation failed: {str(storage_error)}")
-            # Clean up temp file before returning error
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-            return https_fn.Response(
-                json.dumps({'error': f'File storage failed: {str(storage_error)}'}), 
-                headers=headers, 
-                status=500
-            )
-        
-        # Clean up temporary file
-        try:
-            os.remove(temp_path)
-            print(f"[ADMIN-LOG] ✓ Temporary file cleaned up")
-        except Exception as cleanup_error:
-            print(f"[ADMIN-LOG] ⚠ Temp file cleanup failed: {str(cleanup_error)}")
+            logger.error("✗ Storage operation failed: %s", storage_error)
+            return _json_response(req, {'error': f'File storage failed: {str(storage_error)}'}, status=500)
         
         # Return secure download URL
-        return https_fn.Response(json.dumps({
+        return _json_response(req, {
             'downloadURL': download_url,
-            'fileName': temp_filename,
+            'fileName': file_name,
             'expiresIn': '4 hours'
-        }), headers=headers, status=200)
+        })
         
     except Exception as e:
-        return https_fn.Response(json.dumps({'error': f'Export error: {str(e)}'}), headers=headers, status=500)
+        return _json_response(req, {'error': f'Export error: {str(e)}'}, status=500)
 
-@https_fn.on_request(cors=options.CorsOptions(cors_origins="*", cors_methods=["GET", "POST"]))
+# Routed from Hosting (/optimize), so one warm instance is kept to avoid cold starts
+@https_fn.on_request(
+    cors=options.CorsOptions(cors_origins="*", cors_methods=["GET", "POST"]),
+    timeout_sec=120,
+    memory=options.MemoryOption.MB_256,
+    cpu=1,
+    concurrency=40,
+    min_instances=1
+)
 def optimize_conversation(req: https_fn.Request) -> https_fn.Response:
     """Token optimization: Extract PRD data, update storage, and summarize conversation"""
     
     # Handle CORS preflight
-    if req.method == 'OPTIONS':
-        headers = {
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Methods': 'POST, OPTIONS',
-            'Access-Control-Allow-Headers': 'Content-Type',
-            'Access-Control-Max-Age': '3600'
-        }
-        return https_fn.Response('', headers=headers, status=204)
-    
-    headers = {
-        'Access-Control-Allow-Origin': '*',
-        'Content-Type': 'application/json'
-    }
+    preflight = _handle_preflight(req)
+    if preflight is not None:
+        return preflight
     
     try:
-        print(f"[ADMIN-LOG] Starting conversation optimization")
+        logger.info("Starting conversation optimization")
         
-        # Parse request
-        request_json = req.get_json(silent=True)
-        if not request_json:
-            return https_fn.Response(json.dumps({'error': 'Invalid JSON'}), headers=headers, status=400)
-            
-        conversation = request_json.get('conversation', [])
+        # Parse request and check the OpenAI API key
+        request_json, conversation, error = _parse_conversation(
+            req,
+            min_messages=2,
+            empty_error='No conversation to optimize',
+            key_error='OpenAI API key not configured for optimization'
+        )
+        if error is not None:
+            return error
         total_tokens = request_json.get('totalTokens', 0)
         
-        if not conversation or len(conversation) <= 1:
-            return https_fn.Response(json.dumps({'error': 'No conversation to optimize'}), headers=headers, status=400)
-        
-        # Check if OpenAI API key is available
-        if not OPENAI_API_KEY:
-            error_msg = 'OpenAI API key not configured for optimization'
-            print(f"ERROR: {error_msg}")
-            return https_fn.Response(json.dumps({'error': error_msg}), headers=headers, status=500)
-        
         # Extract conversation text (excluding system messages for analysis)
         conversation_text = "\n".join([
             f"{msg['role'].upper()}: {msg['content']}" 
@@ -652,16 +898,20 @@ def optimize_conversation(req: https_fn.Request) -> https_fn.Response:
         # Estimate original conversation tokens
         original_tokens = estimate_conversation_tokens(conversation)
         
-        print(f"[ADMIN-LOG] Optimizing conversation with {len(conversation)} messages, ~{original_tokens} tokens, user reported {total_tokens} tokens")
+        logger.info("Optimizing conversation with %s messages, ~%s tokens, user reported %s tokens", len(conversation), original_tokens, total_tokens)
         
-        # Step 1: Extract PRD-relevant information
-        prd_data = extract_prd_information(conversation_text)
+        # Load the stored PRD and cumulative summary concurrently
+        existing_prd, existing_summary = load_prd_and_summary()
         
-        # Step 2: Update PRD storage file
-        update_prd_storage(prd_data, total_tokens)
+        # Steps 1 & 2: Extract PRD-relevant information and update the cumulative summary (one model call)
+        prd_data, conversation_summary, summary_saved = extract_and_summarize(conversation_text, existing_prd, existing_summary)
         
-        # Step 3: Create conversation summary
-        conversation_summary = summarize_conversation(conversation_text)
+        # Step 3: Update PRD storage file (overlaps with the summary upload); nothing to write when
+        # the extraction was skipped because its result is already stored
+        if prd_data:
+            update_prd_storage(prd_data, total_tokens)
+        if summary_saved is not None:
+            summary_saved.result()
         
         # Step 4: Create optimized conversation with system prompt + summary
         system_prompt = conversation[0] if conversation[0]['role'] == 'system' else {
@@ -684,9 +934,9 @@ def optimize_conversation(req: https_fn.Request) -> https_fn.Response:
         # Estimate optimized conversation tokens
         optimized_tokens = estimate_conversation_tokens(optimized_conversation)
         
-        print(f"[ADMIN-LOG] ✓ Optimization complete: {len(conversation)} → {len(optimized_conversation)} messages, ~{original_tokens} → ~{optimized_tokens} tokens")
+        logger.info("✓ Optimization complete: %s → %s messages, ~%s → ~%s tokens", len(conversation), len(optimized_conversation), original_tokens, optimized_tokens)
         
-        return https_fn.Response(json.dumps({
+        return _json_response(req, {
             'optimizedConversation': optimized_conversation,
             'originalMessages': len(conversation),
             'optimizedMessages': len(optimized_conversation),
@@ -695,42 +945,112 @@ def optimize_conversation(req: https_fn.Request) -> https_fn.Response:
             'tokenSavings': max(original_tokens, total_tokens) - optimized_tokens,
             'prdDataExtracted': len(prd_data),
             'summary': conversation_summary[:200] + "..." if len(conversation_summary) > 200 else conversation_summary
-        }), headers=headers, status=200)
+        })
         
     except Exception as e:
-        print(f"[ADMIN-LOG] ✗ Optimization failed: {str(e)}")
-        return https_fn.Response(json.dumps({'error': f'Optimization error: {str(e)}'}), headers=headers, status=500)
+        logger.error("✗ Optimization failed: %s", e)
+        return _json_response(req, {'error': f'Optimization error: {str(e)}'}, status=500)
 
-def extract_prd_information(conversation_text: str) -> dict:
-    """Extract PRD-relevant information from conversation using AI, intelligently merging with existing PRD"""
-    
-    # Load existing PRD data first
-    existing_prd = {}
-    try:
-        client = storage.Client()
-        bucket = client.bucket(f'{PROJECT_ID}.firebasestorage.app')
-        blob = bucket.blob('prd_data/current_prd.json')
-        
-        if blob.exists():
-            existing_json = blob.download_as_text()
-            existing_data = json.loads(existing_json)
-            existing_prd = existing_data.get('sections', {})
-            print(f"[ADMIN-LOG] Loaded existing PRD with {len(existing_prd)} sections for intelligent merge")
+# Keywords that mark a PRD section as discussed. Must match the Cloud Run service's PRD_SECTIONS
+# (deployed separately, so it can't be imported); tests/test_prd_sections.py checks they agree
+PRD_SECTION_KEYWORDS = {
+    'executiveSummary': ('overview', 'summary', 'vision', 'idea', 'building', 'product'),
+    'problemStatement': ('problem', 'pain', 'struggle', 'frustrat', 'challenge', 'issue'),
+    'goals': ('goal', 'objective', 'achieve', 'outcome', 'purpose'),
+    'targetUsers': ('users', 'persona', 'customer', 'audience', 'segment', 'admin', 'team'),
+    'userStories': ('as a', 'story', 'stories', 'journey', 'use case', 'flow', 'scenario'),
+    'features': ('feature', 'functionality', 'capabilit', 'integrat', 'dashboard', 'screen', 'support'),
+    'technicalConsiderations': ('technical', 'architecture', 'api', 'database', 'stack', 'infra',
+                                'scal', 'security', 'privacy', 'performance', 'constraint'),
+    'successMetrics': ('metric', 'kpi', 'measure', 'success', 'retention', 'conversion', 'adoption', '%'),
+    'timeline': ('timeline', 'milestone', 'deadline', 'phase', 'launch', 'mvp', 'beta', 'release',
+                 'week', 'month', 'quarter'),
+    'outOfScope': ('out of scope', 'not build', "won't", 'exclude', 'non-goal', 'later', 'future'),
+}
+
+def split_prd_for_prompt(existing_prd: dict, conversation_text: str):
+    """Split stored sections into those the conversation mentions (sent in full) and the rest (sent as key + length).
+
+    Returns (shown_sections, kept_lengths). Sections without a keyword entry are always shown.
+    """
+    text = conversation_text.lower()
+    shown = {}
+    kept = {}
+    for key, value in existing_prd.items():
+        keywords = PRD_SECTION_KEYWORDS.get(key)
+        if keywords is None or any(kw in text for kw in keywords):
+            shown[key] = value
         else:
-            print(f"[ADMIN-LOG] No existing PRD found, starting fresh")
-    except Exception as e:
-        print(f"[ADMIN-LOG] Could not load existing PRD: {str(e)}")
+            kept[key] = len(str(value))
+    return shown, kept
+
+def extract_and_summarize(conversation_text: str, existing_prd: dict, existing_summary: str):
+    """Merge new conversation into the PRD sections and the cumulative summary with one model call.
+
+    Returns (prd_data, summary, summary_saved). On failure, or when this conversation's result is already
+    stored, prd_data is {} and the previous summary is kept.
+    The updated summary is saved back to storage on _IO_POOL; summary_saved is that future (None if
+    nothing is saved) so the caller can overlap the upload with its own storage writes.
+    """
+    fallback_summary = existing_summary if existing_summary else "Previous conversation covered PRD planning and requirements."
     
-    # Create smart extraction prompt that includes existing PRD context
-    prd_extraction_prompt = f"""You are updating an existing PRD with new information from a conversation. 
+    # Retries and double-submits of a conversation this instance already merged: if storage still holds
+    # exactly that result (no other session has written since), there is nothing to call or write
+    cache_key = hashlib.blake2b(conversation_text.encode(), digest_size=16).digest()
+    cached = get_cached_extraction(cache_key)
+    if cached is not None and extraction_is_stored(cached, existing_prd, existing_summary):
+        logger.info("Conversation already merged into the stored PRD and summary, skipping extraction")
+        return {}, existing_summary, None
+    
+    extracted = request_prd_and_summary(conversation_text, existing_prd, existing_summary)
+    if extracted is None:
+        return {}, fallback_summary, None
+    prd_data, updated_summary = extracted
+    if updated_summary.strip():
+        cache_extraction(cache_key, extracted)
+    
+    if not updated_summary.strip():
+        return prd_data, fallback_summary, None
+    
+    # Common when the conversation added nothing new; skip the redundant storage write
+    if updated_summary == existing_summary:
+        logger.info("Summary unchanged, skipping upload")
+        return prd_data, updated_summary, None
+    
+    # Save updated summary back to storage in the background
+    return prd_data, updated_summary, _IO_POOL.submit(save_summary, updated_summary)
 
-EXISTING PRD SECTIONS:
-{json.dumps(existing_prd, indent=2) if existing_prd else "No existing PRD data"}
+# Recent extraction results by conversation hash: {blake2b digest: (prd_data, summary)}
+EXTRACT_CACHE_SIZE = 32
+_EXTRACT_CACHE = OrderedDict()
 
-NEW CONVERSATION TO ANALYZE:
-{conversation_text}
+def extraction_is_stored(extracted: tuple, existing_prd: dict, existing_summary: str) -> bool:
+    """True if the stored summary and sections already equal this extraction's result"""
+    prd_data, summary = extracted
+    return summary == existing_summary and all(
+        existing_prd.get(section) == content for section, content in mergeable_sections(prd_data).items()
+    )
 
-INSTRUCTIONS:
+def get_cached_extraction(cache_key: bytes):
+    with _CACHE_LOCK:
+        cached = _EXTRACT_CACHE.get(cache_key)
+        if cached is not None:
+            _EXTRACT_CACHE.move_to_end(cache_key)
+        return cached
+
+def cache_extraction(cache_key: bytes, extracted: tuple):
+    with _CACHE_LOCK:
+        _EXTRACT_CACHE[cache_key] = extracted
+        _EXTRACT_CACHE.move_to_end(cache_key)
+        if len(_EXTRACT_CACHE) > EXTRACT_CACHE_SIZE:
+            _EXTRACT_CACHE.popitem(last=False)
+
+# Optimize prompt (static parts, built once per instance)
+_OPTIMIZE_PROMPT_HEADER = 'You are updating an existing PRD and a cumulative conversation summary with new information from a conversation.\n\nEXISTING PRD SECTIONS:\n'
+_OPTIMIZE_PROMPT_SUMMARY = '\n\nEXISTING SUMMARY:\n'
+_OPTIMIZE_PROMPT_CONVERSATION = '\n\nNEW CONVERSATION TO ANALYZE:\n'
+_OPTIMIZE_KEPT_SECTIONS_NOTE = "\n\nOTHER STORED SECTIONS (not discussed in the new conversation; return null for these, they are kept as stored):\n"
+_OPTIMIZE_PROMPT_STEPS = """TASK 1 - PRD SECTIONS:
 1. Review the EXISTING PRD sections above
 2. Analyze the NEW CONVERSATION for relevant information
 3. For each PRD section below, intelligently merge new info with existing info:
@@ -740,211 +1060,199 @@ INSTRUCTIONS:
    - If neither exists, return null
 
 PRD SECTIONS TO UPDATE:
-- executiveSummary: Brief overview of what we're building
-- problemStatement: Problems being solved, pain points
-- goals: Objectives and success criteria  
-- targetUsers: User personas, segments, characteristics
-- userStories: User journeys, use cases, "As a user" stories
-- features: Specific features and functionality
-- technicalConsiderations: Tech requirements, constraints, architecture
-- successMetrics: KPIs, measurement criteria
-- timeline: Milestones, deadlines, phases
-- outOfScope: What we're NOT building
-
-Return ONLY valid JSON with the COMPLETE updated sections (not just changes):
-{{"sectionName": "complete updated content or existing content or null"}}
-
-JSON:"""
-
-    try:
-        response = requests.post(
-            'https://api.openai.com/v1/chat/completions',
-            headers={
-                'Content-Type': 'application/json',
-                'Authorization': f'Bearer {OPENAI_API_KEY}'
-            },
-            json={
-                'model': 'gpt-4.1-mini',
-                'messages': [{'role': 'user', 'content': prd_extraction_prompt}],
-                'max_tokens': 2048,
-                'temperature': 0.15
-            },
-            timeout=30
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            extracted_text = result['choices'][0]['message']['content']
-            
-            # Clean and parse JSON
-            extracted_text = extracted_text.strip()
-            if extracted_text.startswith('```json'):
-                extracted_text = extracted_text[7:-3]
-            elif extracted_text.startswith('```'):
-                extracted_text = extracted_text[3:-3]
-                
-            return json.loads(extracted_text)
-        else:
-            print(f"[ADMIN-LOG] PRD extraction failed: {response.status_code}")
-            return {}
-            
-    except Exception as e:
-        print(f"[ADMIN-LOG] PRD extraction error: {str(e)}")
-        return {}
-
-def summarize_conversation(conversation_text: str) -> str:
-    """Create a cumulative summary building on previous summary + new conversation"""
-    
-    # Load existing summary from storage
-    existing_summary = ""
-    try:
-        client = storage.Client()
-        bucket = client.bucket(f'{PROJECT_ID}.firebasestorage.app')
-        blob = bucket.blob('prd_data/conversation_summary.txt')
-        
-        if blob.exists():
-            existing_summary = blob.download_as_text()
-            print(f"[ADMIN-LOG] Loaded existing summary ({len(existing_summary)} chars) for intelligent merge")
-        else:
-            print(f"[ADMIN-LOG] No existing summary found, creating first summary")
-    except Exception as e:
-        print(f"[ADMIN-LOG] Could not load existing summary: {str(e)}")
-    
-    # Create intelligent summary merging prompt
-    if existing_summary.strip():
-        summary_prompt = f"""You are updating a cumulative conversation summary with new information.
+"""
 
-EXISTING SUMMARY:
-{existing_summary}
+_OPTIMIZE_SECTION_LINES = {
+    'executiveSummary': "- executiveSummary: Brief overview of what we're building",
+    'problemStatement': '- problemStatement: Problems being solved, pain points',
+    'goals': '- goals: Objectives and success criteria',
+    'targetUsers': '- targetUsers: User personas, segments, characteristics',
+    'userStories': '- userStories: User journeys, use cases, "As a user" stories',
+    'features': '- features: Specific features and functionality',
+    'technicalConsiderations': '- technicalConsiderations: Tech requirements, constraints, architecture',
+    'successMetrics': '- successMetrics: KPIs, measurement criteria',
+    'timeline': '- timeline: Milestones, deadlines, phases',
+    'outOfScope': "- outOfScope: What we're NOT building",
+}
 
-NEW CONVERSATION SINCE LAST SUMMARY:
-{conversation_text}
+_OPTIMIZE_PROMPT_SUMMARY_TASK = """
 
-INSTRUCTIONS:
-1. Review the EXISTING SUMMARY above  
-2. Analyze the NEW CONVERSATION for additional relevant information
-3. Create an UPDATED SUMMARY that intelligently merges both:
+TASK 2 - SUMMARY:
+Create an UPDATED SUMMARY that merges the EXISTING SUMMARY (if any) with the NEW CONVERSATION:
    - If new info conflicts with existing, prioritize NEW information
    - If new info adds to existing, incorporate it seamlessly  
    - If new info repeats existing, don't duplicate
-   - Maintain key decisions, requirements, and context from both
    - Keep the summary concise but comprehensive (max 1000 words)
 
 Focus on:
-- Key decisions and requirements discussed (old + new)
-- User needs and problems identified (old + new)
-- Features and functionality mentioned (old + new)  
-- Technical constraints or preferences (old + new)
-- Business goals and success criteria (old + new)
-
-Keep bullets short; preserve explicit numbers, dates, decisions.
-UPDATED SUMMARY:"""
-    else:
-        summary_prompt = f"""Summarize this conversation into key points for PRD context. Focus on:
-
 - Key decisions and requirements discussed
-- User needs and problems identified  
+- User needs and problems identified
 - Features and functionality mentioned
 - Technical constraints or preferences
 - Business goals and success criteria
 
-Keep it concise but comprehensive (max 1000 words).
-
 Keep bullets short; preserve explicit numbers, dates, decisions.
 
-CONVERSATION:
-{conversation_text}
+Return ONLY valid JSON with the COMPLETE updated sections (not just changes) and the updated summary:
+{"sections": {"sectionName": "complete updated content or existing content or null"}, "summary": "updated summary"}
 
-SUMMARY:"""
+JSON:JSON:"""
+
+def request_prd_and_summary(conversation_text: str, existing_prd: dict, existing_summary: str):
+    """Ask the model for the merged PRD sections and updated summary. Returns (prd_data, summary) or None on failure."""
+    # Sections the conversation doesn't touch are listed by size only and come back null (kept as stored)
+    shown_prd, kept_lengths = split_prd_for_prompt(existing_prd, conversation_text)
+    # Only these sections are listed for update, and only these are accepted from the reply
+    requested = [key for key in _OPTIMIZE_SECTION_LINES if key not in kept_lengths]
+    requested += [key for key in shown_prd if key not in _OPTIMIZE_SECTION_LINES]
+    kept_note = ""
+    if kept_lengths:
+        kept_note = _OPTIMIZE_KEPT_SECTIONS_NOTE + "\n".join(
+            f"- {key} ({length} chars)" for key, length in kept_lengths.items()
+        )
+    
+    # One prompt for both outputs: the conversation is sent (and tokenized) once
+    prompt = ''.join((
+        _OPTIMIZE_PROMPT_HEADER,
+        orjson.dumps(shown_prd, option=orjson.OPT_INDENT_2).decode() if shown_prd else "No existing PRD data for the sections discussed" if existing_prd else "No existing PRD data",
+        kept_note,
+        _OPTIMIZE_PROMPT_SUMMARY,
+        existing_summary if existing_summary.strip() else "No existing summary",
+        _OPTIMIZE_PROMPT_CONVERSATION,
+        conversation_text,
+        "\n\n",
+        _OPTIMIZE_PROMPT_STEPS,
+        "\n".join(_OPTIMIZE_SECTION_LINES.get(key, f"- {key}") for key in requested) or "- (none)",
+        _OPTIMIZE_PROMPT_SUMMARY_TASK
+    ))
 
     try:
-        response = requests.post(
-            'https://api.openai.com/v1/chat/completions',
-            headers={
-                'Content-Type': 'application/json',
-                'Authorization': f'Bearer {OPENAI_API_KEY}'
-            },
+        response = _SESSION.post(
+            OPENAI_CHAT_URL,
             json={
                 'model': 'gpt-4.1-mini',
-                'messages': [{'role': 'user', 'content': summary_prompt}],
-                'max_tokens': 1024,
-                'temperature': 0.15
+                'messages': [{'role': 'user', 'content': prompt}],
+                'max_tokens': 3072,
+                'temperature': 0.15,
+                'stream': True
             },
+            stream=True,
             timeout=30
         )
         
-        if response.status_code == 200:
-            result = response.json()
-            updated_summary = result['choices'][0]['message']['content']
-            
-            # Save updated summary back to storage
-            try:
-                client = storage.Client()
-                bucket = client.bucket(f'{PROJECT_ID}.firebasestorage.app')
-                blob = bucket.blob('prd_data/conversation_summary.txt')
-                blob.upload_from_string(updated_summary, content_type='text/plain')
-                print(f"[ADMIN-LOG] ✓ Updated summary saved ({len(updated_summary)} chars)")
-            except Exception as e:
-                print(f"[ADMIN-LOG] ✗ Failed to save updated summary: {str(e)}")
-            
-            return updated_summary
-        else:
-            print(f"[ADMIN-LOG] Summary generation failed: {response.status_code}")
-            return existing_summary if existing_summary else "Previous conversation covered PRD planning and requirements."
-            
+        # Streamed so the 30s read timeout applies between chunks rather than to the whole 3k-token completion
+        with response:
+            if response.status_code != 200:
+                logger.warning("PRD extraction and summary failed: %s", response.status_code)
+                return None
+            extracted_text = ''.join(iter_stream_deltas(response))
+        
+        # Clean and parse JSON: drop a leading ```/```json fence line and a trailing fence, leaving
+        # the body intact (section content may itself contain fenced code blocks)
+        extracted_text = extracted_text.strip()
+        if extracted_text.startswith('```'):
+            extracted_text = extracted_text.partition('\n')[2].rstrip().removesuffix('```')
+        
+        extracted = orjson.loads(extracted_text)
+        # A section the model never saw in full must not overwrite the stored one
+        returned_sections = extracted.get('sections') or {}
+        prd_data = {key: returned_sections[key] for key in requested if key in returned_sections}
+        updated_summary = extracted.get('summary') or ""
     except Exception as e:
-        print(f"[ADMIN-LOG] Summary error: {str(e)}")
-        return existing_summary if existing_summary else "Previous conversation covered PRD planning and requirements."
+        logger.warning("PRD extraction and summary error: %s", e)
+        return None
+    
+    return prd_data, updated_summary
+
+def save_summary(summary: str):
+    """Write the cumulative conversation summary back to storage"""
+    try:
+        bucket = get_bucket()
+        blob = bucket.blob('prd_data/conversation_summary.txt')
+        blob.upload_from_string(summary, content_type='text/plain')
+        remember_blob(blob, summary)
+        logger.info("✓ Updated summary saved (%s chars)", len(summary))
+    except Exception as e:
+        logger.error("✗ Failed to save updated summary: %s", e)
+
+@dataclass(slots=True)
+class PRDDocument:
+    """Stored shape of prd_data/current_prd.json (orjson serializes dataclasses natively)"""
+    lastUpdated: str
+    totalTokens: int
+    version: int
+    sections: dict = field(default_factory=dict)
+
+# Write attempts for the PRD blob: the first plus one fresh read-and-merge after losing a race
+PRD_WRITE_ATTEMPTS = 2
+
+def mergeable_sections(prd_data: dict) -> dict:
+    """Sections of a model reply that carry content (null, empty and non-string values keep the stored section)"""
+    return {
+        section: new_info for section, new_info in prd_data.items()
+        if isinstance(new_info, str) and (stripped := new_info.strip()) and stripped.lower() != 'null'
+    }
 
 def update_prd_storage(prd_data: dict, total_tokens: int):
     """Update PRD storage file with new information"""
     
+    # Replace each section that has content with the AI-merged version (no appending)
+    merged_sections = mergeable_sections(prd_data)
+    
     try:
         # Use Firebase Storage for PRD data persistence
-        client = storage.Client()
-        bucket = client.bucket(f'{PROJECT_ID}.firebasestorage.app')
+        bucket = get_bucket()
         blob = bucket.blob('prd_data/current_prd.json')
         
-        # Try to load existing data
-        existing_data = {}
-        try:
-            if blob.exists():
-                existing_json = blob.download_as_text()
-                existing_data = json.loads(existing_json)
-                print(f"[ADMIN-LOG] Loaded existing PRD data: {len(existing_data.get('sections', {}))} sections")
-        except Exception as e:
-            print(f"[ADMIN-LOG] No existing PRD data found: {str(e)}")
-        
-        # Merge new data with existing
-        updated_data = {
-            'lastUpdated': datetime.datetime.utcnow().isoformat(),
-            'totalTokens': total_tokens,
-            'version': existing_data.get('version', 0) + 1,
-            'sections': existing_data.get('sections', {})
-        }
-        
-        # Update each section with new information
-        for section, new_info in prd_data.items():
-            if new_info and new_info.strip() and new_info.lower() != 'null':
-                # Replace the section entirely with AI-merged content (no appending)
-                updated_data['sections'][section] = new_info
-                print(f"[ADMIN-LOG] Updated section '{section}' with merged content")
-        
-        # Save updated data
-        blob.upload_from_string(
-            json.dumps(updated_data, indent=2),
-            content_type='application/json'
-        )
+        for attempt in range(1, PRD_WRITE_ATTEMPTS + 1):
+            # Try to load existing data; the generation we read is the precondition for our write
+            existing_data = {}
+            try:
+                # One GET: raises NotFound for a missing object, and the response headers set blob.generation
+                existing_data = orjson.loads(blob.download_as_bytes())
+                read_generation = blob.generation
+                logger.info("Loaded existing PRD data: %s sections", len(existing_data.get('sections', {})))
+            except NotFound:
+                read_generation = 0  # object must not exist yet
+                logger.info("No existing PRD data found, creating it")
+            except Exception as e:
+                # Without a read generation the write would be unconditional and drop every other stored section
+                logger.error("✗ Could not read existing PRD, skipping update: %s", e)
+                return
+            
+            # Merge new data with existing
+            updated_data = PRDDocument(
+                lastUpdated=datetime.datetime.utcnow().isoformat(),
+                totalTokens=total_tokens,
+                version=existing_data.get('version', 0) + 1,
+                sections={**existing_data.get('sections', {}), **merged_sections}
+            )
+            
+            # Save updated data; if_generation_match fails instead of overwriting a concurrent optimize's update.
+            # Stored gzip-encoded: storage clients (and the Cloud Run service) decompress it transparently on download.
+            blob.content_encoding = 'gzip'
+            try:
+                blob.upload_from_string(
+                    gzip.compress(orjson.dumps(updated_data, option=orjson.OPT_INDENT_2), compresslevel=6),
+                    content_type='application/json',
+                    if_generation_match=read_generation
+                )
+            except PreconditionFailed:
+                if attempt == PRD_WRITE_ATTEMPTS:
+                    raise
+                logger.info("PRD changed since it was read, re-reading and merging again")
+                continue
+            break
         
-        print(f"[ADMIN-LOG] ✓ PRD data updated: version {updated_data['version']}, {len(updated_data['sections'])} sections")
+        remember_blob(blob, updated_data.sections)
+        logger.info("Updated %s sections with merged content: %s", len(merged_sections), ', '.join(merged_sections))
+        logger.info("✓ PRD data updated: version %s, %s sections", updated_data.version, len(updated_data.sections))
         
     except Exception as e:
-        print(f"[ADMIN-LOG] ✗ PRD storage update failed: {str(e)}")
+        logger.error("✗ PRD storage update failed: %s", e)
 
 def estimate_conversation_tokens(conversation: list) -> int:
     """Estimate the total number of tokens in a conversation"""
     
-    token_count = 0
-    for msg in conversation:
-        token_count += len(msg['content'].split())
-    return token_count 
\ No newline at end of file
+    # One batched call into tiktoken's Rust encoder instead of splitting each message into a word list
+    return sum(count_text_tokens([msg['content'] for msg in conversation])) 
\ No newline at end of file
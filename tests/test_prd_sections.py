@@ -0,0 +1,36 @@
+"""
+The Cloud Run service and the Firebase functions deploy separately, so each keeps its own
+copy of the PRD section keyword table. This keeps the two copies in sync.
+
+Run with: python -m unittest discover tests
+"""
+import ast
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def module_constant(path: Path, name: str):
+    """Literal value of a module-level assignment, read without importing the module"""
+    tree = ast.parse(path.read_text(encoding='utf-8'))
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(
+            isinstance(target, ast.Name) and target.id == name for target in node.targets
+        ):
+            return ast.literal_eval(node.value)
+    raise AssertionError(f"{name} not found in {path}")
+
+
+class PRDSectionKeywordsTest(unittest.TestCase):
+    def test_functions_keywords_match_cloud_run_sections(self):
+        cloud_run = module_constant(ROOT / 'cloud-run-streaming' / 'main.py', 'PRD_SECTIONS')
+        functions = module_constant(ROOT / 'functions' / 'main.py', 'PRD_SECTION_KEYWORDS')
+
+        self.assertEqual(list(functions), list(cloud_run))
+        for key, (_, keywords) in cloud_run.items():
+            self.assertEqual(functions[key], keywords, f"keywords for '{key}' differ")
+
+
+if __name__ == '__main__':
+    unittest.main()